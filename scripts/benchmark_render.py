@@ -0,0 +1,105 @@
+import argparse
+import time
+
+import jax
+import jax.numpy as jnp
+
+import jaxatari.rendering.atraJaxis as aj
+from jaxatari.games.jax_freeway import FreewayRenderer, JaxFreeway
+from jaxatari.games.jax_kangaroo import JaxKangaroo, KangarooRenderer
+from jaxatari.games.jax_pong import JaxPong, PongRenderer
+from jaxatari.games.jax_seaquest import JaxSeaquest, SeaquestRenderer
+
+GAMES = {
+    "pong": (JaxPong, PongRenderer, 6),
+    "seaquest": (JaxSeaquest, SeaquestRenderer, 18),
+    "kangaroo": (JaxKangaroo, KangarooRenderer, 18),
+    "freeway": (JaxFreeway, FreewayRenderer, 3),
+}
+
+
+def make_states(env, num_actions, batch_size, warmup_steps, seed=0):
+    """Returns a batch of diverse states by stepping copies of the initial state with random actions."""
+    _, state = env.reset()
+    states = jax.tree.map(lambda x: jnp.broadcast_to(x, (batch_size,) + jnp.shape(x)), state)
+
+    @jax.jit
+    def rollout(states, key):
+        def body(states, key):
+            actions = jax.random.randint(key, (batch_size,), 0, num_actions)
+            _, states, *_ = jax.vmap(env.step)(states, actions)
+            return states, None
+
+        states, _ = jax.lax.scan(body, states, jax.random.split(key, warmup_steps))
+        return states
+
+    return rollout(states, jax.random.PRNGKey(seed))
+
+
+def memory_bytes(compiled):
+    """Memory analysis of a compiled render: (arguments + outputs - aliased buffers, temporaries)."""
+    analysis = compiled.memory_analysis()
+    if analysis is None:
+        return float("nan"), float("nan")
+    live = analysis.argument_size_in_bytes + analysis.output_size_in_bytes - analysis.alias_size_in_bytes
+    return live, analysis.temp_size_in_bytes
+
+
+def benchmark(game, batch_size, iterations, warmup_steps):
+    env_cls, renderer_cls, num_actions = GAMES[game]
+    env, renderer = env_cls(), renderer_cls()
+    states = make_states(env, num_actions, batch_size, warmup_steps)
+
+    batched_render = aj.make_batched_render(renderer.render)
+    frames = batched_render(states)
+    # the second call compiles the donating variant
+    frames = batched_render(states, frames)
+    frames.block_until_ready()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        frames = batched_render(states, frames)
+    frames.block_until_ready()
+    elapsed = time.perf_counter() - start
+
+    # Steady state: without donation the previous frames are still alive while the new ones are written
+    plain_live, plain_temp = memory_bytes(jax.jit(jax.vmap(renderer.render)).lower(states).compile())
+    donated_live, donated_temp = memory_bytes(
+        jax.jit(lambda s, f: jax.vmap(renderer.render)(s), donate_argnums=(1,)).lower(states, frames).compile()
+    )
+    device_stats = jax.devices()[0].memory_stats() or {}
+
+    return {
+        "fps": batch_size * iterations / elapsed,
+        "frame_mb": frames.nbytes / 2**20,
+        "temp_mb": donated_temp / 2**20,
+        "peak_mb": (plain_live + frames.nbytes + plain_temp) / 2**20,
+        "peak_donated_mb": (donated_live + donated_temp) / 2**20,
+        "device_peak_mb": device_stats.get("peak_bytes_in_use", float("nan")) / 2**20,
+    }
+
+
+def main():
+    """Reports frames/sec and peak memory of batched rendering for every game and batch size."""
+    parser = argparse.ArgumentParser(description="Benchmark batched rendering of the JAXAtari games.")
+    parser.add_argument("--games", nargs="*", default=list(GAMES), choices=list(GAMES))
+    parser.add_argument("--batch-sizes", nargs="*", type=int, default=[1, 64, 256, 1024, 4096])
+    parser.add_argument("--iterations", type=int, default=10, help="Timed render calls per measurement.")
+    parser.add_argument("--warmup-steps", type=int, default=64, help="Random env steps to diversify the states.")
+    args = parser.parse_args()
+
+    print(f"backend: {jax.default_backend()}")
+    header = ["game", "batch", "frames/s", "frames MB", "temp MB", "peak MB", "peak MB (donated)", "device peak MB"]
+    print(f"{header[0]:<10}" + "".join(f"{column:>19}" for column in header[1:]))
+    for game in args.games:
+        for batch_size in args.batch_sizes:
+            result = benchmark(game, batch_size, args.iterations, args.warmup_steps)
+            values = [
+                batch_size, result["fps"], result["frame_mb"], result["temp_mb"],
+                result["peak_mb"], result["peak_donated_mb"], result["device_peak_mb"],
+            ]
+            print(f"{game:<10}" + "".join(f"{value:>19.0f}" if i < 2 else f"{value:>19.1f}" for i, value in enumerate(values)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import argparse
+import os
+
+from jaxatari.rendering.atraJaxis import pack_sprite_atlas
+
+DEFAULT_SPRITE_ROOT = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "src", "jaxatari", "games", "sprites")
+)
+
+
+def main():
+    """Packs the sprites of every game into one memory-mappable atlas file per game."""
+    parser = argparse.ArgumentParser(description="Pack the .npy sprites of each game into a single atlas file.")
+    parser.add_argument(
+        "--sprite-root",
+        default=DEFAULT_SPRITE_ROOT,
+        help="Directory containing one sprite directory per game (default: the bundled sprites).",
+    )
+    parser.add_argument("--games", nargs="*", help="Only pack these games (default: all).")
+    args = parser.parse_args()
+
+    games = args.games or sorted(
+        name for name in os.listdir(args.sprite_root) if os.path.isdir(os.path.join(args.sprite_root, name))
+    )
+    for game in games:
+        atlas_path = pack_sprite_atlas(os.path.join(args.sprite_root, game))
+        print(f"{game}: {atlas_path} ({os.path.getsize(atlas_path) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Tuple, Generic, TypeVar
+from typing import Dict, Tuple, Generic, TypeVar
 import jax.numpy as jnp
 import jax.random as jrandom
 
@@ -67,6 +67,17 @@ class JaxEnvironment(Generic[EnvState, EnvObs, EnvInfo]):
         """
         raise NotImplementedError("Abstract method")
 
+    def obs_to_entity_boxes(self, obs: EnvObs) -> Dict[str, jnp.ndarray]:
+        """
+        Converts a single (unstacked) observation frame to the bounding boxes of its entities.
+        Args:
+            obs: The observation of a single frame.
+
+        Returns: A dict mapping each entity class to an array of shape (N, 5) with x, y, width, height and active flag per entity.
+
+        """
+        raise NotImplementedError("Abstract method")
+
     def _get_observation(self, state: EnvState) -> EnvObs:
         """
         Converts the environment state to the observation by filtering out non-relevant information.
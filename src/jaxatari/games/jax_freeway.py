@@ -284,6 +284,12 @@ class JaxFreeway(JaxEnvironment[GameState, FreewayObservation, FreewayInfo]):
             )
         return FreewayObservation(chicken=chicken, car=cars, score=state.score)
 
+    @partial(jax.jit, static_argnums=(0,))
+    def obs_to_entity_boxes(self, obs: FreewayObservation) -> Dict[str, jnp.ndarray]:
+        chicken = jnp.stack([obs.chicken.x, obs.chicken.y, obs.chicken.width, obs.chicken.height, jnp.ones_like(obs.chicken.x)], axis=-1)
+        cars = jnp.concatenate([obs.car, jnp.ones((obs.car.shape[0], 1), dtype=obs.car.dtype)], axis=-1)
+        return {"chicken": chicken.reshape(-1, 5), "cars": cars}
+
     @partial(jax.jit, static_argnums=(0,))
     def _get_info(self, state: GameState) -> FreewayInfo:
         return FreewayInfo(time=state.time)
@@ -301,14 +307,38 @@ from jaxatari.renderers import AtraJaxisRenderer
 import jaxatari.rendering.atraJaxis as aj
 
 class FreewayRenderer(AtraJaxisRenderer):
-
-    def __init__(self):
+    # entity lists of `JaxFreeway.obs_to_entity_boxes`, class id i + 1 in the segmentation masks
+    # (the fixed 2nd chicken is part of the pre-baked background and is not labeled)
+    segmentation_classes = ("chicken", "cars")
+    asset_attributes = ("sprites", "background")
+
+    def __init__(self, layout: str = "WHC"):
+        """
+        Args:
+            layout: "WHC" renders (160, 210, 3) rasters, "HWC" renders (210, 160, 3) rasters
+                from untransposed sprites.
+        """
         super().__init__()
+        self.layout = layout
         self.sprites = self._load_sprites()
         self.game_config = GameConfig()
+        # Static background including the fixed 2nd chicken, composited once
+        self.background = aj.bake_background(
+            jnp.zeros(aj.xy(160, 210, layout) + (3,), dtype=jnp.uint8),
+            [
+                (0, 0, aj.get_sprite_frame(self.sprites['background'], 0)),
+                (
+                    110,
+                    self.game_config.bottom_border + self.game_config.chicken_height - 1,
+                    aj.get_sprite_frame(self.sprites['player_idle'], 0),
+                ),
+            ],
+            layout,
+        )
 
     def _load_sprites(self):
-        """Load all sprites required for Freeway rendering."""
+        """Load all sprites required for Freeway rendering, in the layout of the renderer."""
+        transpose = self.layout == "WHC"
         MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
         sprite_path = os.path.join(MODULE_DIR, "sprites/freeway/")
 
@@ -317,7 +347,7 @@ class FreewayRenderer(AtraJaxisRenderer):
         # Helper function to load a single sprite frame
         def _load_sprite_frame(name: str) -> Optional[chex.Array]:
             path = os.path.join(sprite_path, f'{name}.npy')
-            frame = aj.loadFrame(path)
+            frame = aj.loadFrame(path, transpose=transpose)
             return frame.astype(jnp.uint8)
 
         # --- Load Sprites ---
@@ -344,7 +374,7 @@ class FreewayRenderer(AtraJaxisRenderer):
         # --- Load Digit Sprites ---
         # Score digits
         score_digit_path = os.path.join(sprite_path, 'score_{}.npy')
-        digits = aj.load_and_pad_digits(score_digit_path, num_chars=10)
+        digits = aj.load_and_pad_digits(score_digit_path, num_chars=10, transpose=transpose)
         sprites['score'] = digits
 
         # expand all sprites similar to the Pong/Seaquest loading
@@ -356,21 +386,17 @@ class FreewayRenderer(AtraJaxisRenderer):
 
         return sprites
 
-    @partial(jax.jit, static_argnums=(0,))
-    def render(self, state):
-        """Render the game state to a raster image."""
-        raster = jnp.zeros((160, 210, 3), dtype=jnp.uint8)
-
-        # draw the background
-        background = aj.get_sprite_frame(self.sprites['background'], 0)
+    def _render(self, state):
+        """Render the game state to a raster image and its segmentation masks."""
+        # start from the pre-baked background (includes the fixed 2nd chicken)
+        layout = self.layout
+        raster = self.background
+        masks = aj.empty_masks(160, 210, layout)
+        segmentation_ids = aj.segmentation_ids(zip(self.segmentation_classes, (1, state.cars.shape[0])))
 
-        raster = aj.render_at(raster,0, 0, background)
-
-        # draw fixed 2nd chicken at x=110 and y=self.config.bottom_border + self.config.chicken_height - 1
         chicken_idle = aj.get_sprite_frame(self.sprites['player_idle'], 0)
         chicken_walk = aj.get_sprite_frame(self.sprites['player_walk'], 0)
         chicken_hit = aj.get_sprite_frame(self.sprites['player_hit'], 0)
-        raster = aj.render_at(raster, 110, self.game_config.bottom_border + self.game_config.chicken_height - 1, chicken_idle)
 
         # select a frame based on the walking frames (0-3 for walk, 4-7 for idle, repeat)
         use_idle = state.walking_frames < 4
@@ -388,38 +414,73 @@ class FreewayRenderer(AtraJaxisRenderer):
             lambda: chicken
         )
 
-        raster = aj.render_at(raster, self.game_config.chicken_x, state.chicken_y, chicken)
+        chicken_class, chicken_instances = segmentation_ids["chicken"]
+        raster, masks = aj.render_at(
+            raster, self.game_config.chicken_x, state.chicken_y, chicken,
+            masks=masks, instance_id=chicken_instances[0], class_id=chicken_class, layout=layout,
+        )
 
+        car_class, car_instances = segmentation_ids["cars"]
         # render the cars in the correct color (starting from the top: dark red, light green, dark green, light red, blue, brown, light blue, red, green, yellow)
         dark_red = aj.get_sprite_frame(self.sprites['car_dark_red'], 0)
-        raster = aj.render_at(raster, state.cars[0, 0], state.cars[0, 1], dark_red)
+        raster, masks = aj.render_at(
+            raster, state.cars[0, 0], state.cars[0, 1], dark_red,
+            masks=masks, instance_id=car_instances[0], class_id=car_class, layout=layout,
+        )
 
         light_green = aj.get_sprite_frame(self.sprites['car_light_green'], 0)
-        raster = aj.render_at(raster, state.cars[1, 0], state.cars[1, 1], light_green)
+        raster, masks = aj.render_at(
+            raster, state.cars[1, 0], state.cars[1, 1], light_green,
+            masks=masks, instance_id=car_instances[1], class_id=car_class, layout=layout,
+        )
 
         dark_green = aj.get_sprite_frame(self.sprites['car_dark_green'], 0)
-        raster = aj.render_at(raster, state.cars[2, 0], state.cars[2, 1], dark_green)
+        raster, masks = aj.render_at(
+            raster, state.cars[2, 0], state.cars[2, 1], dark_green,
+            masks=masks, instance_id=car_instances[2], class_id=car_class, layout=layout,
+        )
 
         light_red = aj.get_sprite_frame(self.sprites['car_light_red'], 0)
-        raster = aj.render_at(raster, state.cars[3, 0], state.cars[3, 1], light_red)
+        raster, masks = aj.render_at(
+            raster, state.cars[3, 0], state.cars[3, 1], light_red,
+            masks=masks, instance_id=car_instances[3], class_id=car_class, layout=layout,
+        )
 
         blue = aj.get_sprite_frame(self.sprites['car_blue'], 0)
-        raster = aj.render_at(raster, state.cars[4, 0], state.cars[4, 1], blue)
+        raster, masks = aj.render_at(
+            raster, state.cars[4, 0], state.cars[4, 1], blue,
+            masks=masks, instance_id=car_instances[4], class_id=car_class, layout=layout,
+        )
 
         brown = aj.get_sprite_frame(self.sprites['car_brown'], 0)
-        raster = aj.render_at(raster, state.cars[5, 0], state.cars[5, 1], brown)
+        raster, masks = aj.render_at(
+            raster, state.cars[5, 0], state.cars[5, 1], brown,
+            masks=masks, instance_id=car_instances[5], class_id=car_class, layout=layout,
+        )
 
         light_blue = aj.get_sprite_frame(self.sprites['car_light_blue'], 0)
-        raster = aj.render_at(raster, state.cars[6, 0], state.cars[6, 1], light_blue)
+        raster, masks = aj.render_at(
+            raster, state.cars[6, 0], state.cars[6, 1], light_blue,
+            masks=masks, instance_id=car_instances[6], class_id=car_class, layout=layout,
+        )
 
         red = aj.get_sprite_frame(self.sprites['car_red'], 0)
-        raster = aj.render_at(raster, state.cars[7, 0], state.cars[7, 1], red)
+        raster, masks = aj.render_at(
+            raster, state.cars[7, 0], state.cars[7, 1], red,
+            masks=masks, instance_id=car_instances[7], class_id=car_class, layout=layout,
+        )
 
         green = aj.get_sprite_frame(self.sprites['car_green'], 0)
-        raster = aj.render_at(raster, state.cars[8, 0], state.cars[8, 1], green)
+        raster, masks = aj.render_at(
+            raster, state.cars[8, 0], state.cars[8, 1], green,
+            masks=masks, instance_id=car_instances[8], class_id=car_class, layout=layout,
+        )
 
         yellow = aj.get_sprite_frame(self.sprites['car_yellow'], 0)
-        raster = aj.render_at(raster, state.cars[9, 0], state.cars[9, 1], yellow)
+        raster, masks = aj.render_at(
+            raster, state.cars[9, 0], state.cars[9, 1], yellow,
+            masks=masks, instance_id=car_instances[9], class_id=car_class, layout=layout,
+        )
 
         # ----------- SCORE -------------
         # Define score positions and spacing
@@ -461,7 +522,7 @@ class FreewayRenderer(AtraJaxisRenderer):
             raster_updated = aj.render_label_selective(raster_to_update, player_render_x, score_y,
                                                        player_score_digits_indices, digit_sprites[0],
                                                        player_start_index, player_num_to_render,
-                                                       spacing=score_spacing)
+                                                       spacing=score_spacing, layout=layout)
 
             # --- Enemy Score (Right - rendering a Dummy '0' since the right player is not playable) ---
             enemy_score = 0
@@ -476,7 +537,7 @@ class FreewayRenderer(AtraJaxisRenderer):
             raster_final = aj.render_label_selective(raster_updated, enemy_render_x, score_y,
                                                      enemy_score_digits_indices, digit_sprites[0],
                                                      enemy_start_index, enemy_num_to_render,
-                                                     spacing=score_spacing)  # Spacing doesn't matter here
+                                                     spacing=score_spacing, layout=layout)  # Spacing doesn't matter here
             return raster_final
 
         # Render scores conditionally
@@ -489,9 +550,11 @@ class FreewayRenderer(AtraJaxisRenderer):
 
         # Force the first 8 columns (x=0 to x=7) to be black (KEEP THIS PART)
         bar_width = 8
-        raster = raster.at[0:bar_width, :, :].set(0)
+        left_columns = aj.xy(slice(0, bar_width), slice(None), layout)
+        raster = raster.at[left_columns].set(0)
+        masks = aj.SegmentationMasks(*(mask.at[left_columns].set(0) for mask in masks))
 
-        return raster
+        return raster, masks
 
 def main():
     pygame.init()
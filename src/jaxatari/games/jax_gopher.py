@@ -329,17 +329,17 @@ class Renderer_AtraJaxisGopherGame:
         self.SPRITE_BLOCK_UP,
         self.SPRITES_SCORES 
         ) = load_sprites()
+        # Static background, composited once
+        self.BACKGROUND = aj.bake_background(
+            jnp.zeros((WIDTH, HEIGHT, 3)), [(0, 0, aj.get_sprite_frame(self.SPRITE_BG, 0))]
+        )
 
 
     
     @partial(jax.jit, static_argnums=(0,))
     def render(self, state:GopherState):
         
-        raster = jnp.zeros((WIDTH, HEIGHT, 3))
-
-        frame_bg = aj.get_sprite_frame(self.SPRITE_BG, 0)
-
-        raster = aj.render_at(raster, 0, 0, frame_bg)
+        raster = self.BACKGROUND
 
         frame_player = jax.lax.cond(
             state.player_is_digging,
@@ -1693,6 +1693,33 @@ class JaxKangaroo(JaxEnvironment[KangarooState, KangarooObservation, KangarooInf
         obs_flat= jnp.concatenate([jnp.ravel(leaf) for leaf in obs_leaves])
         return obs_flat
 
+    @partial(jax.jit, static_argnums=(0,))
+    def obs_to_entity_boxes(self, obs: KangarooObservation) -> Dict[str, chex.Array]:
+        def boxes(positions, width, height, active):
+            positions = positions.reshape(-1, 2)
+            sizes = jnp.broadcast_to(jnp.array([width, height]), positions.shape)
+            active = jnp.broadcast_to(active, positions.shape[:1])
+            return jnp.concatenate([positions, sizes, active[:, None]], axis=-1)
+
+        return {
+            "player": boxes(jnp.stack([obs.player_x, obs.player_y]), PLAYER_WIDTH, PLAYER_HEIGHT, True),
+            # unused platform and ladder slots are padded with -1
+            "platforms": jnp.concatenate(
+                [obs.platform_positions, obs.platform_sizes, obs.platform_sizes[:, :1] > 0], axis=-1
+            ),
+            "ladders": jnp.concatenate(
+                [obs.ladder_positions, obs.ladder_sizes, obs.ladder_sizes[:, :1] > 0], axis=-1
+            ),
+            "fruits": boxes(obs.fruit_positions, FRUIT_WIDTH, FRUIT_HEIGHT, obs.fruit_actives),
+            "bell": boxes(obs.bell_position, BELL_WIDTH, BELL_HEIGHT, True),
+            "child": boxes(obs.child_position, CHILD_WIDTH, CHILD_HEIGHT, True),
+            "monkeys": boxes(obs.monkey_positions, MONKEY_WIDTH, MONKEY_HEIGHT, obs.monkey_states != 0),
+            "coconuts": jnp.concatenate([
+                boxes(obs.falling_coco_position, COCONUT_WIDTH, COCONUT_HEIGHT, obs.falling_coco_position[1] != -1),
+                boxes(obs.coco_positions, COCONUT_WIDTH, COCONUT_HEIGHT, obs.coco_states != 0),
+            ]),
+        }
+
     def action_space(self) -> spaces.Discrete:
         return spaces.Discrete(len(self.action_set))
 
@@ -2082,30 +2109,58 @@ from jaxatari.renderers import AtraJaxisRenderer
 class KangarooRenderer(AtraJaxisRenderer):
     # Type hint for sprites dictionary
     sprites: Dict[str, Any]
+    # entity lists of `JaxKangaroo.obs_to_entity_boxes`, class id i + 1 in the segmentation masks
+    # (platforms and ladders are part of the pre-baked background and are not labeled)
+    segmentation_classes = ("player", "platforms", "ladders", "fruits", "bell", "child", "monkeys", "coconuts")
+    asset_attributes = ("sprites", "level_backgrounds", "entity_atlas")
 
-    def __init__(self):
+    def __init__(self, layout: str = "WHC"):
         """
         Initializes the renderer by loading sprites, including level backgrounds.
 
         Args:
-            sprite_path: Path to the directory containing sprite .npy files.
+            layout: "WHC" renders (SCREEN_WIDTH, SCREEN_HEIGHT, 3) rasters, "HWC" renders
+                (SCREEN_HEIGHT, SCREEN_WIDTH, 3) rasters from untransposed sprites.
         """
+        self.layout = layout
         self.sprite_path = f"{os.path.dirname(os.path.abspath(__file__))}/sprites/kangaroo"
         self.sprites = self._load_sprites()
         # Store background sprites directly for use in render function
         self.background_0 = self.sprites.get('background_0')
         self.background_1 = self.sprites.get('background_1')
         self.background_2 = self.sprites.get('background_2')
+        # Pre-baked backgrounds indexed by level (level 0 is empty), composited once
+        empty_raster = jnp.zeros(aj.xy(SCREEN_WIDTH, SCREEN_HEIGHT, layout) + (3,), dtype=jnp.uint8)
+        self.level_backgrounds = jnp.stack(
+            [empty_raster]
+            + [
+                aj.bake_background(empty_raster, [(0, 0, aj.get_sprite_frame(background, 0))], layout)
+                for background in (self.background_0, self.background_1, self.background_2)
+            ]
+        )
+        # Atlas of all dynamic sprites, these are drawn in a single pass
+        self.entity_sprite_names = (
+            'strawberry', 'bell', 'ringing_bell',
+            'ape_standing', 'ape_climb_left', 'ape_moving', 'throwing_ape', 'ape_climb_right',
+            'kangaroo', 'kangaroo_climb', 'kangaroo_dead', 'kangaroo_ducking',
+            'kangaroo_jump_high', 'kangaroo_jump', 'kangaroo_walk', 'kangaroo_boxing',
+            'child', 'child_jump', 'thrown_coconut', 'coconut',
+        )
+        self.entity_atlas, entity_offsets = aj.build_atlas(
+            [self.sprites[name] for name in self.entity_sprite_names]
+        )
+        self.sprite_ids = dict(zip(self.entity_sprite_names, entity_offsets))
 
 
     def _load_sprites(self) -> dict[str, Any]:
-        """Loads all necessary sprites from .npy files."""
+        """Loads all necessary sprites from .npy files, in the layout of the renderer."""
         sprites: Dict[str, Any] = {}
+        transpose = self.layout == "WHC"
 
         # Helper function to load a single sprite frame
         def _load_sprite_frame(name: str) -> Optional[chex.Array]:
             path = os.path.join(self.sprite_path, f'{name}.npy')
-            frame = aj.loadFrame(path)
+            frame = aj.loadFrame(path, transpose=transpose)
             if isinstance(frame, jnp.ndarray) and frame.ndim >= 2:
                 return frame.astype(jnp.uint8)
 
@@ -2156,12 +2211,12 @@ class KangarooRenderer(AtraJaxisRenderer):
         # --- Load Digit Sprites ---
         # Score digits
         score_digit_path = os.path.join(self.sprite_path, 'score_{}.npy')
-        digits = aj.load_and_pad_digits(score_digit_path, num_chars=10)
+        digits = aj.load_and_pad_digits(score_digit_path, num_chars=10, transpose=transpose)
         sprites['digits'] = digits
 
         # Time digits
         time_digit_path = os.path.join(self.sprite_path, 'time_{}.npy')
-        time_digits = aj.load_and_pad_digits(time_digit_path, num_chars=10)
+        time_digits = aj.load_and_pad_digits(time_digit_path, num_chars=10, transpose=transpose)
         sprites['time_digits'] = time_digits
 
         # expand all sprites similar to the Pong/Seaquest loading
@@ -2173,9 +2228,7 @@ class KangarooRenderer(AtraJaxisRenderer):
 
         return sprites
 
-    # Apply JIT compilation. static_argnums=(0,) means 'self' is static.
-    @partial(jax.jit, static_argnums=(0,))
-    def render(self, state: KangarooState) -> chex.Array:
+    def _render(self, state: KangarooState) -> Tuple[chex.Array, aj.SegmentationMasks]:
         """
         Renders the current game state to a JAX array (raster image)
         using pre-rendered backgrounds per level.
@@ -2184,52 +2237,59 @@ class KangarooRenderer(AtraJaxisRenderer):
             state: The current KangarooState.
 
         Returns:
-            A JAX array representing the rendered game screen (HEIGHT, WIDTH, 3), dtype=uint8.
+            The rendered game screen (SCREEN_WIDTH, SCREEN_HEIGHT, 3), dtype=uint8, and its
+            segmentation masks.
         """
 
-        # --- Select and Render Background ---
-        # Initialize raster (optional, could directly use background if it covers all)
-        # Starting with zeros allows transparency in dynamic sprites if they use it.
-        raster = jnp.zeros((SCREEN_WIDTH, SCREEN_HEIGHT, 3), dtype=jnp.uint8)
-
+        # --- Select Background ---
         # Get the current level index (ensure it's integer and within bounds 0-2)
         level_idx = state.current_level.astype(int)
         # Clamp index to be safe, although state should ideally be valid
         level_idx = jnp.clip(level_idx, 1, 3)
 
-        selected_background = jax.lax.switch(
-            level_idx,
-            [
-                lambda: jnp.zeros(self.background_0.shape, dtype=self.background_0.dtype),  # Level 0 (empty)
-                lambda: self.background_0,  # Level 1
-                lambda: self.background_1,  # Level 2
-                lambda: self.background_2,  # Level 3
-            ]
-        )
-        selected_background = aj.get_sprite_frame(selected_background, 0)
-
-        raster = aj.render_at(raster, 0, 0, selected_background)
+        # Start from the pre-baked background of the level
+        raster = self.level_backgrounds[level_idx]
 
         # --- Removed Wall Rendering ---
         # --- Removed Platform Rendering Loop ---
         # --- Removed Ladder Rendering Loop ---
 
-        # --- Draw fruits (Strawberries) ---
-        fruit_sprite = self.sprites.get('strawberry', None)
+        # --- Draw dynamic sprites ---
+        # All entities are collected in one draw list, later entries are drawn on top
+        layout = self.layout
+        ids = self.sprite_ids
+        masks = aj.empty_masks(SCREEN_WIDTH, SCREEN_HEIGHT, layout)
+        entity_counts = (
+            1,
+            state.level.platform_positions.shape[0],
+            state.level.ladder_positions.shape[0],
+            state.level.fruit_positions.shape[0],
+            1,
+            1,
+            state.level.monkey_positions.shape[0],
+            1 + state.level.coco_positions.shape[0],
+        )
+        segmentation_ids = aj.segmentation_ids(zip(self.segmentation_classes, entity_counts))
+        fruit_class, fruit_instances = segmentation_ids["fruits"]
+        bell_class, bell_instance = segmentation_ids["bell"]
+        monkey_class, monkey_instances = segmentation_ids["monkeys"]
+        player_class, player_instance = segmentation_ids["player"]
+        child_class, child_instance = segmentation_ids["child"]
+        # the falling coconut comes first in the coconut list
+        coco_class, coco_instances = segmentation_ids["coconuts"]
+
+        # --- Fruits (Strawberries) ---
         fruit_positions = state.level.fruit_positions
-        fruit_actives = state.level.fruit_actives
-
-        def _draw_fruit(i, current_raster):
-            should_draw = jnp.logical_and(fruit_actives[i], fruit_sprite is not None)
-            pos = fruit_positions[i]
-            def render_fruit_sprite(raster_to_update):
-                return aj.render_at(raster_to_update, pos[0].astype(int), pos[1].astype(int), aj.get_sprite_frame(fruit_sprite, 0))
-            return jax.lax.cond(should_draw, render_fruit_sprite, lambda r: r, current_raster)
-
-        num_fruits_to_draw = fruit_positions.shape[0]
-        raster = jax.lax.fori_loop(0, num_fruits_to_draw, _draw_fruit, raster)
+        fruits = aj.make_draw_list(
+            ids['strawberry'],
+            fruit_positions[:, 0].astype(int),
+            fruit_positions[:, 1].astype(int),
+            visible=state.level.fruit_actives,
+            instance_id=fruit_instances,
+            class_id=fruit_class,
+        )
 
-        # --- Draw Bell ---
+        # --- Bell ---
         # if the bell_animation is: 192-176, 143-128, 95-80, 47-32 draw the alternate bell sprite
         bell_in_range_left = jnp.logical_or(
             jnp.logical_and(state.level.bell_animation <= 192, state.level.bell_animation >= 176),
@@ -2241,92 +2301,75 @@ class KangarooRenderer(AtraJaxisRenderer):
             jnp.logical_and(state.level.bell_animation <= 47, state.level.bell_animation >= 32)
         )
 
-        bell_sprite = jax.lax.cond(
-            jnp.logical_or(bell_in_range_left, bell_in_range_right),
-            lambda: self.sprites.get('ringing_bell'),
-            lambda: self.sprites.get('bell')
-        )
-
         bell_pos = state.level.bell_position
         not_all_fruits_collected = ~jnp.any(state.level.fruit_stages == 3)
         bell_pos_valid = bell_pos[0] != -1
-        sprite_is_valid = bell_sprite is not None
-        should_draw_bell = jnp.logical_and(jnp.logical_and(not_all_fruits_collected, bell_pos_valid), sprite_is_valid)
-
-        def draw_bell_func(current_raster):
-            return aj.render_at(current_raster, bell_pos[0].astype(int), bell_pos[1].astype(int), aj.get_sprite_frame(bell_sprite, 0), flip_horizontal=bell_in_range_left)
-        raster = jax.lax.cond(should_draw_bell, draw_bell_func, lambda r: r, raster)
+        bell = aj.make_draw_list(
+            jnp.where(jnp.logical_or(bell_in_range_left, bell_in_range_right), ids['ringing_bell'], ids['bell']),
+            bell_pos[0].astype(int),
+            bell_pos[1].astype(int),
+            visible=jnp.logical_and(not_all_fruits_collected, bell_pos_valid),
+            flip_horizontal=bell_in_range_left,
+            instance_id=bell_instance,
+            class_id=bell_class,
+        )
 
-        # --- Draw monkeys (Apes) ---
+        # --- Monkeys (Apes) ---
         monkey_positions = state.level.monkey_positions
-        monkey_states = state.level.monkey_states
-
-        def _draw_monkey(i, current_raster):
-            state_idx = monkey_states[i].astype(int)
-            pos = monkey_positions[i]
-            should_draw = state_idx != 0
-            """
-            - 0: non-existent
-            - 1: moving down
-            - 2: moving left
-            - 3: throwing
-            - 4: moving right
-            - 5: moving up
-            """
-            monkey_sprite = jax.lax.switch(
-                state_idx,
-                [
-                    lambda: self.sprites.get('ape_standing'), # Case 0
-                    lambda: self.sprites.get('ape_climb_left'),    # Case 1
-                    lambda: self.sprites.get('ape_moving'),    # Case 2
-                    lambda: self.sprites.get('throwing_ape'),  # Case 3
-                    lambda: self.sprites.get('ape_moving'),    # Case 4
-                    lambda: self.sprites.get('ape_climb_right'),# Case 5
-                ]
-            )
-
-            # in case its state_idx 2 or 4 and the counter is % 16, use standing instead of moving
-            monkey_sprite = jax.lax.cond(
-                jnp.logical_and(
-                    (state.level.step_counter % 32) < 16,
-                    jnp.logical_or(state_idx == 2, state_idx == 4)
-                ),
-                lambda: self.sprites.get('ape_standing'),
-                lambda: monkey_sprite
-            )
-
-            is_moving_left = (state_idx == 4)
-            flip_h = is_moving_left
-            sprite_is_valid = monkey_sprite is not None
-            should_draw = jnp.logical_and(should_draw, sprite_is_valid)
-            def render_monkey_sprite(raster_to_update):
-                return aj.render_at(raster_to_update, pos[0].astype(int), pos[1].astype(int), aj.get_sprite_frame(monkey_sprite, 0), flip_horizontal=flip_h)
-            return jax.lax.cond(should_draw, render_monkey_sprite, lambda r: r, current_raster)
-
-        num_monkeys_to_draw = monkey_positions.shape[0]
-        raster = jax.lax.fori_loop(0, num_monkeys_to_draw, _draw_monkey, raster)
+        monkey_states = state.level.monkey_states.astype(int)
+        """
+        - 0: non-existent
+        - 1: moving down
+        - 2: moving left
+        - 3: throwing
+        - 4: moving right
+        - 5: moving up
+        """
+        monkey_sprite_ids = jnp.array([
+            ids['ape_standing'],     # Case 0
+            ids['ape_climb_left'],   # Case 1
+            ids['ape_moving'],       # Case 2
+            ids['throwing_ape'],     # Case 3
+            ids['ape_moving'],       # Case 4
+            ids['ape_climb_right'],  # Case 5
+        ])[monkey_states]
+        # in case its state_idx 2 or 4 and the counter is % 16, use standing instead of moving
+        monkey_sprite_ids = jnp.where(
+            jnp.logical_and(
+                (state.level.step_counter % 32) < 16,
+                jnp.logical_or(monkey_states == 2, monkey_states == 4)
+            ),
+            ids['ape_standing'],
+            monkey_sprite_ids
+        )
+        monkeys = aj.make_draw_list(
+            monkey_sprite_ids,
+            monkey_positions[:, 0].astype(int),
+            monkey_positions[:, 1].astype(int),
+            visible=monkey_states != 0,
+            flip_horizontal=monkey_states == 4,
+            instance_id=monkey_instances,
+            class_id=monkey_class,
+        )
 
-        # --- Draw player (Kangaroo) ---
-        player_pos_x = state.player.x
+        # --- Player (Kangaroo) ---
         player_pos_y = state.player.y
-        player_orientation = state.player.orientation
-        flip_player = player_orientation < 0
-        sprite_lambda = jax.lax.cond(
-            state.player.is_crashing, lambda: self.sprites.get('kangaroo_dead'),
-            lambda: jax.lax.cond(
-                state.player.is_climbing, lambda: self.sprites.get('kangaroo_climb'),
-                lambda: jax.lax.cond(
-                    state.player.is_crouching, lambda: self.sprites.get('kangaroo_ducking'),
-                    lambda: jax.lax.cond(
-                        state.player.is_jumping, lambda: self.sprites.get('kangaroo_jump'),
-                        lambda: jax.lax.cond(
-                            state.player.punch_left | state.player.punch_right,
-                            lambda: self.sprites.get('kangaroo_boxing'),
-                            lambda: self.sprites.get('kangaroo')
-                        )
-                    )
-                )
-            )
+        player_sprite_id = jnp.select(
+            [
+                state.player.is_crashing,
+                state.player.is_climbing,
+                state.player.is_crouching,
+                state.player.is_jumping,
+                state.player.punch_left | state.player.punch_right,
+            ],
+            [
+                ids['kangaroo_dead'],
+                ids['kangaroo_climb'],
+                ids['kangaroo_ducking'],
+                ids['kangaroo_jump'],
+                ids['kangaroo_boxing'],
+            ],
+            ids['kangaroo'],
         )
 
         # check if player.walk_animation is between 6 and 16 in which range the kangaroo has a different animation
@@ -2338,80 +2381,83 @@ class KangarooRenderer(AtraJaxisRenderer):
             player_pos_y - 1,
             player_pos_y
         )
-
-        sprite_lambda = jax.lax.cond(
-            player_walking_animation,
-            lambda: self.sprites.get('kangaroo_walk'),
-            lambda: sprite_lambda
-        )
+        player_sprite_id = jnp.where(player_walking_animation, ids['kangaroo_walk'], player_sprite_id)
 
         # in case the player_animation is between 17 and 25, use high jump
-        sprite_lambda = jax.lax.cond(
+        player_sprite_id = jnp.where(
             jnp.logical_and(state.player.jump_counter > 16, state.player.jump_counter < 25),
-            lambda: self.sprites.get('kangaroo_jump_high'),
-            lambda: sprite_lambda
+            ids['kangaroo_jump_high'],
+            player_sprite_id
+        )
+        player = aj.make_draw_list(
+            player_sprite_id,
+            state.player.x.astype(int),
+            player_pos_y.astype(int),
+            flip_horizontal=state.player.orientation < 0,
+            instance_id=player_instance,
+            class_id=player_class,
         )
 
-        player_sprite = sprite_lambda
-        sprite_is_valid = player_sprite is not None
-        def render_player_sprite(raster_to_update):
-             return aj.render_at(raster_to_update, player_pos_x.astype(int), player_pos_y.astype(int), aj.get_sprite_frame(player_sprite, 0), flip_horizontal=flip_player)
-        raster = jax.lax.cond(sprite_is_valid, render_player_sprite, lambda r: r, raster)
-
-        # --- Draw Child ---
+        # --- Child ---
         child_pos = state.level.child_position
         is_jumping = (state.level.step_counter % 32) < 16
         # if the velocity is negative, flip horizontal
-        child_flip = state.level.child_velocity > 0
-        child_sprite_lambda = jax.lax.cond(
-            is_jumping, lambda: self.sprites.get('child_jump'), lambda: self.sprites.get('child')
+        child = aj.make_draw_list(
+            jnp.where(is_jumping, ids['child_jump'], ids['child']),
+            child_pos[0].astype(int),
+            child_pos[1].astype(int),
+            visible=child_pos[0] != -1,
+            flip_horizontal=state.level.child_velocity > 0,
+            instance_id=child_instance,
+            class_id=child_class,
         )
-        child_sprite = child_sprite_lambda
-        should_draw_child = jnp.logical_and(child_pos[0] != -1, child_sprite is not None)
-        def draw_child_func(current_raster):
-            return aj.render_at(current_raster, child_pos[0].astype(int), child_pos[1].astype(int), aj.get_sprite_frame(child_sprite, 0), child_flip)
-        raster = jax.lax.cond(should_draw_child, draw_child_func, lambda r: r, raster)
 
-        # --- Draw falling coconut ---
+        # --- Falling coconut ---
         falling_coco_pos = state.level.falling_coco_position
-        coco_sprite = self.sprites.get('thrown_coconut', None)
-        should_draw_falling_coco = jnp.logical_and(falling_coco_pos[1] != -1, coco_sprite is not None)
-        def draw_falling_coco_func(current_raster):
-            return aj.render_at(current_raster, falling_coco_pos[0].astype(int), falling_coco_pos[1].astype(int), aj.get_sprite_frame(coco_sprite, 0))
-        raster = jax.lax.cond(should_draw_falling_coco, draw_falling_coco_func, lambda r: r, raster)
+        falling_coco = aj.make_draw_list(
+            ids['thrown_coconut'],
+            falling_coco_pos[0].astype(int),
+            falling_coco_pos[1].astype(int),
+            visible=falling_coco_pos[1] != -1,
+            instance_id=coco_instances[0],
+            class_id=coco_class,
+        )
 
-        # --- Draw thrown coconuts ---
+        # --- Thrown coconuts ---
         coco_positions = state.level.coco_positions
-        coco_states = state.level.coco_states
-        coco_sprite = self.sprites.get('coconut', None)
-        def _draw_coco(i, current_raster):
-            should_draw = jnp.logical_and(coco_states[i] != 0, coco_sprite is not None)
-            pos = coco_positions[i]
-            def render_coco_sprite(raster_to_update):
-                return aj.render_at(raster_to_update, pos[0].astype(int), pos[1].astype(int), aj.get_sprite_frame(coco_sprite, 0))
-            return jax.lax.cond(should_draw, render_coco_sprite, lambda r: r, current_raster)
-        num_cocos_to_draw = coco_positions.shape[0]
-        raster = jax.lax.fori_loop(0, num_cocos_to_draw, _draw_coco, raster)
+        cocos = aj.make_draw_list(
+            ids['coconut'],
+            coco_positions[:, 0].astype(int),
+            coco_positions[:, 1].astype(int),
+            visible=state.level.coco_states != 0,
+            instance_id=coco_instances[1:],
+            class_id=coco_class,
+        )
+
+        draw_list = aj.concat_draw_lists(fruits, bell, monkeys, player, child, falling_coco, cocos)
+        raster, masks = aj.render_draw_list(raster, draw_list, self.entity_atlas, masks, layout)
 
         # --- Draw UI ---
         # Score
         digit_sprites = self.sprites.get('digits', None)
         score_digits_indices = aj.int_to_digits(state.score, max_digits=6)
-        raster = aj.render_label(raster, 105, 182, score_digits_indices, digit_sprites[0], spacing=8)
+        raster = aj.render_label(raster, 105, 182, score_digits_indices, digit_sprites[0], spacing=8, layout=layout)
 
         # Lives
         life_sprite = self.sprites.get('kangaroo_lives', None)
         lives_count = jnp.maximum(state.lives.astype(int) - 1, 0)
-        raster = aj.render_indicator(raster, 15, 182, lives_count, life_sprite[0], spacing=8)
+        raster = aj.render_indicator(raster, 15, 182, lives_count, life_sprite[0], spacing=8, layout=layout)
 
         # Timer
         time_digit_sprites = self.sprites.get('time_digits', None)
         timer_val = jnp.maximum(state.level.timer.astype(int), 0)
         timer_digits_indices = aj.int_to_digits(timer_val, max_digits=4)
-        raster = aj.render_label(raster, 80, 190, timer_digits_indices, time_digit_sprites[0], spacing=4)
+        raster = aj.render_label(
+            raster, 80, 190, timer_digits_indices, time_digit_sprites[0], spacing=4, layout=layout
+        )
 
         # Ensure the final raster has the correct dtype
-        return raster.astype(jnp.uint8)
+        return raster.astype(jnp.uint8), masks
 
 if __name__ == "__main__":
     pygame.init()
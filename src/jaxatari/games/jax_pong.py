@@ -1,6 +1,6 @@
 import os
 from functools import partial
-from typing import NamedTuple, Tuple
+from typing import Dict, NamedTuple, Tuple
 import jax.lax
 import jax.numpy as jnp
 import chex
@@ -633,6 +633,17 @@ class JaxPong(JaxEnvironment[PongState, PongObservation, PongInfo]):
             ]
            )
 
+    @partial(jax.jit, static_argnums=(0,))
+    def obs_to_entity_boxes(self, obs: PongObservation) -> Dict[str, jnp.ndarray]:
+        def boxes(entity: EntityPosition):
+            return jnp.stack([entity.x, entity.y, entity.width, entity.height, jnp.ones_like(entity.x)], axis=-1).reshape(-1, 5)
+
+        return {
+            "player": boxes(obs.player),
+            "enemy": boxes(obs.enemy),
+            "ball": boxes(obs.ball),
+        }
+
     def action_space(self) -> spaces.Discrete:
         return spaces.Discrete(len(self.action_set))
 
@@ -672,16 +683,18 @@ class JaxPong(JaxEnvironment[PongState, PongObservation, PongInfo]):
         )
 
 
-def load_sprites():
-    """Load all sprites required for Pong rendering."""
+def load_sprites(layout="WHC"):
+    """Load all sprites required for Pong rendering, in the given raster layout."""
     MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+    # the sprite files are (H, W, C)
+    transpose = layout == "WHC"
 
     # Load sprites
-    player = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/player.npy"), transpose=True)
-    enemy = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/enemy.npy"), transpose=True)
-    ball = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/ball.npy"), transpose=True)
+    player = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/player.npy"), transpose=transpose)
+    enemy = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/enemy.npy"), transpose=transpose)
+    ball = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/ball.npy"), transpose=transpose)
 
-    bg = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/background.npy"), transpose=True)
+    bg = aj.loadFrame(os.path.join(MODULE_DIR, "sprites/pong/background.npy"), transpose=transpose)
 
     # Convert all sprites to the expected format (add frame dimension)
     SPRITE_BG = jnp.expand_dims(bg, axis=0)
@@ -693,10 +706,12 @@ def load_sprites():
     PLAYER_DIGIT_SPRITES = aj.load_and_pad_digits(
         os.path.join(MODULE_DIR, "sprites/pong/player_score_{}.npy"),
         num_chars=10,
+        transpose=transpose,
     )
     ENEMY_DIGIT_SPRITES = aj.load_and_pad_digits(
         os.path.join(MODULE_DIR, "sprites/pong/enemy_score_{}.npy"),
         num_chars=10,
+        transpose=transpose,
     )
 
     return (
@@ -712,7 +727,19 @@ def load_sprites():
 class PongRenderer(AtraJaxisRenderer):
     """JAX-based Pong game renderer, optimized with JIT compilation."""
 
-    def __init__(self):
+    # entity lists of `JaxPong.obs_to_entity_boxes`, class id i + 1 in the segmentation masks
+    segmentation_classes = ("player", "enemy", "ball")
+    asset_attributes = (
+        "BACKGROUND", "SPRITE_PLAYER", "SPRITE_ENEMY", "SPRITE_BALL", "PLAYER_DIGIT_SPRITES", "ENEMY_DIGIT_SPRITES"
+    )
+
+    def __init__(self, layout: str = "WHC"):
+        """
+        Args:
+            layout: "WHC" renders (WIDTH, HEIGHT, 3) rasters, "HWC" renders (HEIGHT, WIDTH, 3)
+                rasters directly from untransposed sprites.
+        """
+        self.layout = layout
         (
             self.SPRITE_BG,
             self.SPRITE_PLAYER,
@@ -720,10 +747,15 @@ class PongRenderer(AtraJaxisRenderer):
             self.SPRITE_BALL,
             self.PLAYER_DIGIT_SPRITES,
             self.ENEMY_DIGIT_SPRITES,
-        ) = load_sprites()
+        ) = load_sprites(layout)
+        # Static background, composited once
+        self.BACKGROUND = aj.bake_background(
+            jnp.zeros(aj.xy(WIDTH, HEIGHT, layout) + (3,)),
+            [(0, 0, aj.get_sprite_frame(self.SPRITE_BG, 0))],
+            layout,
+        )
 
-    @partial(jax.jit, static_argnums=(0,))
-    def render(self, state):
+    def _render(self, state):
         """
         Renders the current game state using JAX operations.
 
@@ -731,40 +763,56 @@ class PongRenderer(AtraJaxisRenderer):
             state: A PongState object containing the current game state.
 
         Returns:
-            A JAX array representing the rendered frame.
+            A JAX array representing the rendered frame and its segmentation masks.
         """
         # Create empty raster with CORRECT orientation for atraJaxis framework
         # Note: For pygame, the raster is expected to be (width, height, channels)
         # where width corresponds to the horizontal dimension of the screen
-        raster = jnp.zeros((WIDTH, HEIGHT, 3))
-
-        # Render background - (0, 0) is top-left corner
-        frame_bg = aj.get_sprite_frame(self.SPRITE_BG, 0)
-        raster = aj.render_at(raster, 0, 0, frame_bg)
+        # Start from the pre-baked background - (0, 0) is top-left corner
+        layout = self.layout
+        raster = self.BACKGROUND
+        masks = aj.empty_masks(WIDTH, HEIGHT, layout)
+        segmentation_ids = aj.segmentation_ids((name, 1) for name in self.segmentation_classes)
 
         # Render player paddle - IMPORTANT: Swap x and y coordinates
         # render_at takes (raster, y, x, sprite) but we need to swap them due to transposition
         frame_player = aj.get_sprite_frame(self.SPRITE_PLAYER, 0)
-        raster = aj.render_at(raster, PLAYER_X, state.player_y, frame_player)
+        class_id, instance_ids = segmentation_ids["player"]
+        raster, masks = aj.render_at(
+            raster, PLAYER_X, state.player_y, frame_player,
+            masks=masks, instance_id=instance_ids[0], class_id=class_id, layout=layout,
+        )
 
         # Render enemy paddle - same swap needed
         frame_enemy = aj.get_sprite_frame(self.SPRITE_ENEMY, 0)
-        raster = aj.render_at(raster, ENEMY_X,state.enemy_y, frame_enemy)
+        class_id, instance_ids = segmentation_ids["enemy"]
+        raster, masks = aj.render_at(
+            raster, ENEMY_X, state.enemy_y, frame_enemy,
+            masks=masks, instance_id=instance_ids[0], class_id=class_id, layout=layout,
+        )
 
         # Render ball - ball position is (ball_x, ball_y) but needs to be swapped
         frame_ball = aj.get_sprite_frame(self.SPRITE_BALL, 0)
-        raster = aj.render_at(raster, state.ball_x, state.ball_y, frame_ball)
+        class_id, instance_ids = segmentation_ids["ball"]
+        raster, masks = aj.render_at(
+            raster, state.ball_x, state.ball_y, frame_ball,
+            masks=masks, instance_id=instance_ids[0], class_id=class_id, layout=layout,
+        )
 
         wall_color = jnp.array(WALL_COLOR, dtype=jnp.uint8)
         # Top Wall: Full width (x=0 to WIDTH), y from WALL_TOP_Y to WALL_TOP_Y + WALL_TOP_HEIGHT
         top_wall_y_start = WALL_TOP_Y
         top_wall_y_end = WALL_TOP_Y + WALL_TOP_HEIGHT
-        raster = raster.at[:, top_wall_y_start:top_wall_y_end, :].set(wall_color)
+        top_wall = aj.xy(slice(None), slice(top_wall_y_start, top_wall_y_end), layout)
+        raster = raster.at[top_wall].set(wall_color)
+        masks = aj.SegmentationMasks(*(mask.at[top_wall].set(0) for mask in masks))
 
         # Bottom Wall: Full width, y from WALL_BOTTOM_Y to WALL_BOTTOM_Y + WALL_BOTTOM_HEIGHT
         bottom_wall_y_start = WALL_BOTTOM_Y
         bottom_wall_y_end = WALL_BOTTOM_Y + WALL_BOTTOM_HEIGHT
-        raster = raster.at[:, bottom_wall_y_start:bottom_wall_y_end, :].set(wall_color)
+        bottom_wall = aj.xy(slice(None), slice(bottom_wall_y_start, bottom_wall_y_end), layout)
+        raster = raster.at[bottom_wall].set(wall_color)
+        masks = aj.SegmentationMasks(*(mask.at[bottom_wall].set(0) for mask in masks))
 
         # 1. Get digit arrays (always 2 digits)
         player_score_digits = aj.int_to_digits(state.player_score, max_digits=2)
@@ -783,7 +831,7 @@ class PongRenderer(AtraJaxisRenderer):
         raster = aj.render_label_selective(raster, player_render_x, 3,
                                             player_score_digits, self.PLAYER_DIGIT_SPRITES,
                                             player_start_index, player_num_to_render,
-                                            spacing=16)
+                                            spacing=16, layout=layout)
 
         # 4. Determine parameters for enemy score rendering
         is_enemy_single_digit = state.enemy_score < 10
@@ -797,9 +845,9 @@ class PongRenderer(AtraJaxisRenderer):
         raster = aj.render_label_selective(raster, enemy_render_x, 3,
                                            enemy_score_digits, self.ENEMY_DIGIT_SPRITES,
                                            enemy_start_index, enemy_num_to_render,
-                                           spacing=16)
+                                           spacing=16, layout=layout)
 
-        return raster
+        return raster, masks
 
 
 if __name__ == "__main__":
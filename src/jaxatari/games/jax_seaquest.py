@@ -1,6 +1,6 @@
 import os
 from functools import partial
-from typing import Tuple, NamedTuple
+from typing import Dict, Optional, Tuple, NamedTuple
 import jax
 import jax.numpy as jnp
 import chex
@@ -325,6 +325,21 @@ def load_sprites():
     DIVER_INDICATOR,
 ) = load_sprites()
 
+# Atlas with all animation frames of the entity sprites, drawn in a single pass by the renderer
+(
+    ENTITY_ATLAS,
+    (
+        ATLAS_PL_SUB,
+        ATLAS_PL_TORP,
+        ATLAS_DIVER,
+        ATLAS_SHARK,
+        ATLAS_ENEMY_SUB,
+        ATLAS_EN_TORP,
+    ),
+) = aj.build_atlas(
+    [SPRITE_PL_SUB, SPRITE_PL_TORP, SPRITE_DIVER, SPRITE_SHARK, SPRITE_ENEMY_SUB, SPRITE_EN_TORP]
+)
+
 @jax.jit
 def check_collision_single(pos1, size1, pos2, size2):
     """Check collision between two single entities"""
@@ -2445,6 +2460,20 @@ class JaxSeaquest(JaxEnvironment[SeaquestState, SeaquestObservation, SeaquestInf
             obs.oxygen_level.flatten(),
         ])
 
+    @partial(jax.jit, static_argnums=(0,))
+    def obs_to_entity_boxes(self, obs: SeaquestObservation) -> Dict[str, jnp.ndarray]:
+        def boxes(entity: EntityPosition):
+            return jnp.stack([entity.x, entity.y, entity.width, entity.height, entity.active], axis=-1).reshape(-1, 5)
+
+        return {
+            "player": boxes(obs.player),
+            "sharks": obs.sharks,
+            "submarines": obs.submarines,
+            "divers": obs.divers,
+            "enemy_missiles": obs.enemy_missiles,
+            "surface_submarine": boxes(obs.surface_submarine),
+            "player_missile": boxes(obs.player_missile),
+        }
 
     def action_space(self) -> spaces.Discrete:
         return spaces.Discrete(len(self.action_set))
@@ -2966,162 +2995,192 @@ class JaxSeaquest(JaxEnvironment[SeaquestState, SeaquestObservation, SeaquestInf
 from jaxatari.renderers import AtraJaxisRenderer
 
 class SeaquestRenderer(AtraJaxisRenderer):
-    @partial(jax.jit, static_argnums=(0,))
-    def render(self, state):
-        raster = jnp.zeros((WIDTH, HEIGHT, 3))
-
-        # render background
-        frame_bg = aj.get_sprite_frame(SPRITE_BG, 0)
-        raster = aj.render_at(raster, 0, 0, frame_bg)
-
-        # render player submarine
-        frame_pl_sub = aj.get_sprite_frame(SPRITE_PL_SUB, state.step_counter)
-        raster = aj.render_at(
-            raster,
-            state.player_x,
-            state.player_y,
-            frame_pl_sub,
-            flip_horizontal=state.player_direction == FACE_LEFT,
-        )
-
-        # render player torpedo
-        frame_pl_torp = aj.get_sprite_frame(SPRITE_PL_TORP, state.step_counter)
-        should_render = state.player_missile_position[0] > 0
-        raster = jax.lax.cond(
-            should_render,
-            lambda r: aj.render_at(
-                r,
-                state.player_missile_position[0],
-                state.player_missile_position[1],
-                frame_pl_torp,
-                flip_horizontal=state.player_missile_position[2] == FACE_LEFT,
-            ),
-            lambda r: r,
-            raster,
-        )
-
-        # render divers
-        frame_diver = aj.get_sprite_frame(SPRITE_DIVER, state.step_counter)
-        diver_positions = state.diver_positions
-
-        def render_diver(i, raster_base):
-            should_render = diver_positions[i][0] > 0
-            return jax.lax.cond(
-                should_render,
-                lambda r: aj.render_at(
-                    r,
-                    diver_positions[i][0],
-                    diver_positions[i][1],
-                    frame_diver,
-                    flip_horizontal=(diver_positions[i][2] == FACE_LEFT),
-                ),
-                lambda r: r,
-                raster_base,
-            )
-
-        raster = jax.lax.fori_loop(0, MAX_DIVERS, render_diver, raster)
-
-        # render sharks
-        frame_shark = aj.get_sprite_frame(SPRITE_SHARK, state.step_counter)
-
-        def render_shark(i, raster_base):
-            should_render = state.shark_positions[i][0] > 0
-            return jax.lax.cond(
-                should_render,
-                lambda r: aj.render_at(
-                    r,
-                    state.shark_positions[i][0],
-                    state.shark_positions[i][1],
-                    frame_shark,
-                    flip_horizontal=(state.shark_positions[i][2] == FACE_LEFT),
-                ),
-                lambda r: r,
-                raster_base,
-            )
-
-        # Use fori_loop to render all sharks
-        raster = jax.lax.fori_loop(0, MAX_SHARKS, render_shark, raster)
-
-        # render enemy subs
-        frame_enemy_sub = aj.get_sprite_frame(SPRITE_ENEMY_SUB, state.step_counter)
+    # entity lists of `JaxSeaquest.obs_to_entity_boxes`, class id i + 1 in the segmentation masks
+    segmentation_classes = (
+        "player", "sharks", "submarines", "divers", "enemy_missiles", "surface_submarine", "player_missile"
+    )
+    asset_attributes = ("background", "entity_atlas", "digits", "life_indicator", "diver_indicator")
 
-        def render_enemy_sub(i, raster_base):
-            should_render = state.sub_positions[i][0] > 0
-            return jax.lax.cond(
-                should_render,
-                lambda r: aj.render_at(
-                    r,
-                    state.sub_positions[i][0],
-                    state.sub_positions[i][1],
-                    frame_enemy_sub,
-                    flip_horizontal=(state.sub_positions[i][2] == FACE_LEFT),
-                ),
-                lambda r: r,
-                raster_base,
+    def __init__(
+        self, indexed: bool = False, resolution: Optional[Tuple[int, int]] = None, layout: str = "WHC"
+    ):
+        """
+        Args:
+            indexed: If True, `render` returns a uint8 (WIDTH, HEIGHT) raster of indices into
+                `self.palette` instead of a float RGB raster. `aj.apply_palette` expands it to RGB.
+            resolution: Optional (width, height), e.g. (84, 84). Renders directly at this
+                resolution with pre-scaled sprites and positions instead of rendering at full
+                size and resizing. The result approximates `aj.resize_raster` of the full-size
+                frame: the background matches exactly, sprite edges can be off by a pixel
+                (mean absolute error below 2 color levels on typical frames).
+            layout: "WHC" renders (width, height[, 3]) rasters, "HWC" renders (height, width[, 3])
+                rasters with the sprites converted once at construction.
+        """
+        if indexed and resolution is not None:
+            raise ValueError("Scaled sprites need alpha blending, indexed rendering only works at full resolution")
+        self.indexed = indexed
+        self.layout = layout
+        self.resolution = None if resolution is None else tuple(resolution)
+        self.scale = (1.0, 1.0) if resolution is None else (resolution[0] / WIDTH, resolution[1] / HEIGHT)
+        self.palette = aj.build_palette(
+            [SPRITE_BG, SPRITE_PL_SUB, SPRITE_DIVER, SPRITE_SHARK, SPRITE_ENEMY_SUB,
+             SPRITE_PL_TORP, SPRITE_EN_TORP, DIGITS, LIFE_INDICATOR, DIVER_INDICATOR],
+            colors=(OXYGEN_BAR_COLOR,),
+        )
+        # the module-level sprites are (W, H, C), they are converted once to the render layout
+        entity_sprites = [
+            aj.to_layout(sprite, layout) for sprite in
+            (SPRITE_PL_SUB, SPRITE_PL_TORP, SPRITE_DIVER, SPRITE_SHARK, SPRITE_ENEMY_SUB, SPRITE_EN_TORP)
+        ]
+        sprite_bg = aj.to_layout(SPRITE_BG, layout)
+        self.digits = aj.to_layout(DIGITS, layout)
+        self.life_indicator = aj.to_layout(LIFE_INDICATOR, layout)
+        self.diver_indicator = aj.to_layout(DIVER_INDICATOR, layout)
+        if indexed:
+            sprite_bg = aj.to_indexed(sprite_bg, self.palette)
+            empty_raster = jnp.zeros(aj.xy(WIDTH, HEIGHT, layout), dtype=jnp.uint8)
+            self.digits = aj.to_indexed(self.digits, self.palette)
+            self.life_indicator = aj.to_indexed(self.life_indicator, self.palette)
+            self.diver_indicator = aj.to_indexed(self.diver_indicator, self.palette)
+            # same layout as ENTITY_ATLAS, so the ATLAS_* offsets apply
+            self.entity_atlas, _ = aj.build_atlas(
+                [aj.to_indexed(sprite, self.palette) for sprite in entity_sprites], indexed=True
             )
-
-        raster = jax.lax.fori_loop(0, MAX_SUBS, render_enemy_sub, raster)
-
-        def render_enemy_surface_sub(i, raster_base):
-            should_render = state.surface_sub_position[0] > 0
-            return jax.lax.cond(
-                should_render,
-                lambda r: aj.render_at(
-                    r,
-                    state.surface_sub_position[0],
-                    state.surface_sub_position[1],
-                    frame_enemy_sub,
-                    flip_horizontal=(state.surface_sub_position[2] == FACE_LEFT),
-                ),
-                lambda r: r,
-                raster_base,
+            self.oxygen_bar_color = aj.palette_index(self.palette, OXYGEN_BAR_COLOR)
+            self.oxygen_bar_default_color = 0
+        else:
+            empty_raster = jnp.zeros(aj.xy(WIDTH, HEIGHT, layout) + (3,))
+            self.entity_atlas = ENTITY_ATLAS if layout == "WHC" else aj.build_atlas(entity_sprites)[0]
+            self.oxygen_bar_color = OXYGEN_BAR_COLOR
+            self.oxygen_bar_default_color = (0, 0, 0, 0)
+        # Static background, composited once
+        self.background = aj.bake_background(
+            empty_raster, [(0, 0, aj.get_sprite_frame(sprite_bg, 0))], layout
+        )
+        if self.resolution is not None:
+            # scale factors in the order of the raster axes
+            axis_scale = aj.xy(*self.scale, layout)
+            self.background = aj.resize_raster(self.background, aj.xy(*self.resolution, layout))
+            self.entity_atlas = aj.scale_atlas(self.entity_atlas, axis_scale)
+            self.digits = aj.scale_sprite(self.digits, axis_scale)
+            self.life_indicator = aj.scale_sprite(self.life_indicator, axis_scale)
+            self.diver_indicator = aj.scale_sprite(self.diver_indicator, axis_scale)
+
+    def _scaled(self, x: int, y: int) -> Tuple[int, int]:
+        """Maps a static screen position to the render resolution."""
+        return round(x * self.scale[0]), round(y * self.scale[1])
+
+    def _render(self, state):
+        # start from the pre-baked background
+        layout = self.layout
+        raster = self.background
+        masks = aj.empty_masks(*aj.xy(*raster.shape[:2], layout), layout)
+
+        entity_counts = (
+            1,
+            state.shark_positions.shape[0],
+            state.sub_positions.shape[0],
+            state.diver_positions.shape[0],
+            state.enemy_missile_positions.shape[0],
+            1,
+            1,
+        )
+        segmentation_ids = aj.segmentation_ids(zip(self.segmentation_classes, entity_counts))
+
+        # render all entities in one pass, later entries are drawn on top
+        def entity_draws(entity_class, atlas_offset, num_frames, positions, visible):
+            positions = jnp.atleast_2d(positions)
+            class_id, instance_ids = segmentation_ids[entity_class]
+            return aj.make_draw_list(
+                atlas_offset + jnp.mod(state.step_counter, num_frames),
+                positions[:, 0],
+                positions[:, 1],
+                visible=visible,
+                flip_horizontal=positions[:, 2] == FACE_LEFT,
+                instance_id=instance_ids,
+                class_id=class_id,
             )
 
-        raster = jax.lax.fori_loop(
-            0, MAX_SURFACE_SUBS, render_enemy_surface_sub, raster
+        player_position = jnp.stack([state.player_x, state.player_y, state.player_direction])
+        surface_sub_positions = jnp.atleast_2d(state.surface_sub_position)
+        draw_list = aj.concat_draw_lists(
+            entity_draws("player", ATLAS_PL_SUB, SPRITE_PL_SUB.shape[0], player_position, True),
+            entity_draws(
+                "player_missile",
+                ATLAS_PL_TORP,
+                SPRITE_PL_TORP.shape[0],
+                state.player_missile_position,
+                state.player_missile_position[0] > 0,
+            ),
+            entity_draws(
+                "divers",
+                ATLAS_DIVER,
+                SPRITE_DIVER.shape[0],
+                state.diver_positions,
+                state.diver_positions[:, 0] > 0,
+            ),
+            entity_draws(
+                "sharks",
+                ATLAS_SHARK,
+                SPRITE_SHARK.shape[0],
+                state.shark_positions,
+                state.shark_positions[:, 0] > 0,
+            ),
+            entity_draws(
+                "submarines",
+                ATLAS_ENEMY_SUB,
+                SPRITE_ENEMY_SUB.shape[0],
+                state.sub_positions,
+                state.sub_positions[:, 0] > 0,
+            ),
+            entity_draws(
+                "surface_submarine",
+                ATLAS_ENEMY_SUB,
+                SPRITE_ENEMY_SUB.shape[0],
+                surface_sub_positions,
+                surface_sub_positions[:, 0] > 0,
+            ),
+            entity_draws(
+                "enemy_missiles",
+                ATLAS_EN_TORP,
+                SPRITE_EN_TORP.shape[0],
+                state.enemy_missile_positions,
+                state.enemy_missile_positions[:, 0] > 0,
+            ),
         )
-
-        frame_enemy_torp = aj.get_sprite_frame(SPRITE_EN_TORP, state.step_counter)
-
-        def render_enemy_torp(i, raster_base):
-            should_render = state.enemy_missile_positions[i][0] > 0
-            return jax.lax.cond(
-                should_render,
-                lambda r: aj.render_at(
-                    r,
-                    state.enemy_missile_positions[i][0],
-                    state.enemy_missile_positions[i][1],
-                    frame_enemy_torp,
-                    flip_horizontal=(state.enemy_missile_positions[i][2] == FACE_LEFT),
-                ),
-                lambda r: r,
-                raster_base,
-            )
-
-        raster = jax.lax.fori_loop(0, MAX_ENEMY_MISSILES, render_enemy_torp, raster)
+        if self.resolution is not None:
+            draw_list = aj.scale_draw_list(draw_list, self.scale)
+        raster, masks = aj.render_draw_list(raster, draw_list, self.entity_atlas, masks, layout)
 
         # show the scores
+        scale_x, scale_y = self.scale
         score_array = aj.int_to_digits(state.score, max_digits=8)
         # convert the score to a list of digits
-        raster = aj.render_label(raster, 10, 10, score_array, DIGITS, spacing=7)
+        raster = aj.render_label(
+            raster, *self._scaled(10, 10), score_array, self.digits, spacing=7 * scale_x, layout=layout
+        )
         raster = aj.render_indicator(
-            raster, 10, 20, state.lives, LIFE_INDICATOR, spacing=10
+            raster, *self._scaled(10, 20), state.lives, self.life_indicator, spacing=10 * scale_x, layout=layout
         )
         raster = aj.render_indicator(
-            raster, 49, 178, state.divers_collected, DIVER_INDICATOR, spacing=10
+            raster, *self._scaled(49, 178), state.divers_collected, self.diver_indicator,
+            spacing=10 * scale_x, layout=layout,
         )
 
         raster = aj.render_bar(
-            raster, 49, 170, state.oxygen, 64, 63, 5, OXYGEN_BAR_COLOR, (0, 0, 0, 0)
+            raster, *self._scaled(49, 170), state.oxygen, 64, *self._scaled(63, 5),
+            self.oxygen_bar_color, self.oxygen_bar_default_color, layout=layout,
         )
 
         # Force the first 8 columns (x=0 to x=7) to be black
-        bar_width = 8
+        bar_width = round(8 * scale_x)
         # Assuming raster shape is (Height, Width, Channels)
-        # Select all rows (:), the first 'bar_width' columns (0:bar_width), and all channels (:)
-        raster = raster.at[0:bar_width, :, :].set(0)
+        # Select the first 'bar_width' columns (0:bar_width) with all rows and channels (index 0 is black)
+        left_columns = aj.xy(slice(0, bar_width), slice(None), layout)
+        raster = raster.at[left_columns].set(0)
+        masks = aj.SegmentationMasks(*(mask.at[left_columns].set(0) for mask in masks))
 
-        return raster
+        return raster, masks
 
 
 def get_human_action() -> chex.Array:
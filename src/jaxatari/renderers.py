@@ -1,7 +1,224 @@
-class PyGameRenderer:
-    def __init__(self):
-        pass
+import copy
+from functools import partial
+from typing import Any, Dict, Optional, Tuple
+
+import chex
+import jax
+import jax.numpy as jnp
+import pygame
+
+import jaxatari.rendering.atraJaxis as aj
+
+
+LAYOUTS = aj.LAYOUTS
+COLOR_MODES = ("rgb", "gray", "indexed")
+GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def convert_frames(
+    frames: chex.Array,
+    layout: str = "WHC",
+    color: Optional[str] = None,
+    palette: Optional[chex.Array] = None,
+    indexed: bool = False,
+    source_layout: str = "WHC",
+) -> chex.Array:
+    """Converts (batches of) rendered frames to another layout and color mode.
+
+    Args:
+        frames: Frames of shape (..., W, H, C), or (..., W, H) palette indices if `indexed`
+            ((..., H, W, C) and (..., H, W) if `source_layout` is "HWC").
+        layout: "WHC" (the default atraJaxis layout) or "HWC".
+        color: None keeps the frames as rendered. "rgb" returns uint8 frames with 3 channels,
+            "gray" uint8 frames without a channel axis. "indexed" returns uint8 palette indices,
+            RGB frames are mapped to the first opaque palette entry of their color (unknown
+            colors become the transparent index 0).
+        palette: Palette of indexed frames or for the "indexed" mode, see `aj.build_palette`.
+        indexed: Whether `frames` are palette indices.
+        source_layout: Layout of `frames`, they are only transposed if it differs from `layout`.
+
+    Returns:
+        The converted frames.
+    """
+    for frames_layout in (layout, source_layout):
+        if frames_layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {frames_layout}, expected one of {LAYOUTS}")
+    if color is not None and color not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode {color}, expected one of {COLOR_MODES}")
+    if (indexed or color == "indexed") and palette is None:
+        raise ValueError("Indexed frames need a palette")
+    pixel_ndim = 2 if indexed else 3
+
+    if color == "indexed" and not indexed:
+        rgb = frames[..., None, :3].astype(jnp.int32)
+        # index 0 is reserved for transparency, opaque colors map to the other entries
+        matches = jnp.all(rgb == jnp.asarray(palette)[1:, :3].astype(jnp.int32), axis=-1)
+        frames = jnp.where(jnp.any(matches, axis=-1), jnp.argmax(matches, axis=-1) + 1, 0).astype(jnp.uint8)
+        pixel_ndim = 2
+    elif color == "rgb":
+        if indexed:
+            frames = aj.apply_palette(frames, jnp.asarray(palette)[:, :3])
+        frames = jnp.clip(jnp.round(frames[..., :3].astype(jnp.float32)), 0, 255).astype(jnp.uint8)
+        pixel_ndim = 3
+    elif color == "gray":
+        weights = jnp.array(GRAY_WEIGHTS, dtype=jnp.float32)
+        if indexed:
+            # convert the palette once and look the gray values up
+            gray_palette = jnp.asarray(palette)[:, :3].astype(jnp.float32) @ weights
+            frames = aj.apply_palette(frames, gray_palette)
+        else:
+            frames = frames[..., :3].astype(jnp.float32) @ weights
+        frames = jnp.clip(jnp.round(frames), 0, 255).astype(jnp.uint8)
+        pixel_ndim = 2
+
+    if layout != source_layout:
+        # swap the two pixel axes, the leading batch axes and the channel axis stay in place
+        width_axis = frames.ndim - pixel_ndim
+        frames = jnp.swapaxes(frames, width_axis, width_axis + 1)
+    return frames
+
 
 class AtraJaxisRenderer:
+    """Base class of the atraJaxis game renderers.
+
+    Subclasses implement `_render` for a single state and return a raster of shape
+    (WIDTH, HEIGHT, C) together with its segmentation masks. Renderers with an indexed mode set `indexed` and return uint8
+    indices into `palette` of shape (WIDTH, HEIGHT) instead. Renderers that render
+    natively in another `layout` ("HWC", see `aj.xy`) return (HEIGHT, WIDTH[, C]) rasters.
+    The base class provides batched rendering with optional output layouts on top of it,
+    frames are only transposed if the requested layout differs from `layout`.
+
+    The device arrays `_render` reads from the renderer (backgrounds, sprite atlases, glyphs)
+    are listed in `asset_attributes`. They are passed to the compiled render functions as
+    arguments instead of being embedded into each of them as constants. Inside another
+    jitted function (e.g. `AtariWrapper.step`) they are constants of that function.
+
+    Renderers that implement `render_with_masks` list the entity classes of their
+    environment's `obs_to_entity_boxes` in `segmentation_classes`. Class id i + 1 in
+    the masks is `segmentation_classes[i]`, instance id k is row k - 1 of the entity
+    lists concatenated in this order (see `aj.segmentation_ids`).
+    """
+
+    indexed: bool = False
+    palette: Optional[chex.Array] = None
+    layout: str = "WHC"
+    segmentation_classes: Tuple[str, ...] = ()
+    asset_attributes: Tuple[str, ...] = ()
+
     def __init__(self):
         pass
+
+    def _render(self, state) -> Tuple[chex.Array, aj.SegmentationMasks]:
+        """Renders a single (unbatched) state to a raster and its `aj.SegmentationMasks`."""
+        raise NotImplementedError("Abstract method")
+
+    def assets(self) -> Dict[str, Any]:
+        """Returns the device arrays listed in `asset_attributes` by attribute name."""
+        return {name: getattr(self, name) for name in self.asset_attributes}
+
+    def _with_assets(self, assets: Dict[str, Any]) -> "AtraJaxisRenderer":
+        """Returns a shallow copy of the renderer that uses `assets` (e.g. traced arguments)."""
+        renderer = copy.copy(self)
+        renderer.__dict__.update(assets)
+        return renderer
+
+    @partial(jax.jit, static_argnums=(0,), static_argnames=("masks",))
+    def _render_compiled(self, assets: Dict[str, Any], state, masks: bool = False):
+        raster, segmentation = self._with_assets(assets)._render(state)
+        return (raster, segmentation) if masks else raster
+
+    def render(self, state) -> chex.Array:
+        """Renders a single (unbatched) state to a raster."""
+        return self._render_compiled(self.assets(), state)
+
+    def render_with_masks(self, state) -> Tuple[chex.Array, aj.SegmentationMasks]:
+        """Renders a single state and returns the raster and its `aj.SegmentationMasks`.
+
+        The masks are written by the same compositing pass as the colors. Unused mask
+        writes are removed by XLA, so `render` does not pay for them.
+        """
+        return self._render_compiled(self.assets(), state, masks=True)
+
+    def convert(self, frames: chex.Array, layout: Optional[str] = None, color: Optional[str] = None) -> chex.Array:
+        """Converts frames returned by `render` to a layout (default: `self.layout`) and color mode, see `convert_frames`."""
+        layout = self.layout if layout is None else layout
+        return convert_frames(frames, layout, color, self.palette, self.indexed, self.layout)
+
+    def render_many(
+        self,
+        states,
+        layout: Optional[str] = None,
+        color: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        masks: bool = False,
+    ):
+        """Renders a batch of states in a single call.
+
+        Args:
+            states: States with a leading batch axis.
+            layout: Output layout, "WHC" or "HWC", defaults to the renderer's `layout`.
+            color: Output color mode, None (as rendered), "rgb", "gray" or "indexed".
+            chunk_size: If set, the states are rendered in sequential chunks of this size,
+                so the temporaries of rendering stay bounded independent of the batch size
+                (only the output grows with it).
+            masks: If True, the `aj.SegmentationMasks` are rendered as well (see `render_with_masks`).
+
+        Returns:
+            The frames of shape (N, ...) with the layout and color mode applied, or a tuple
+            (frames, masks) with masks of shape (N, W, H) or (N, H, W) if `masks` is set.
+        """
+        layout = self.layout if layout is None else layout
+        return self._render_many(self.assets(), states, layout, color, chunk_size, masks)
+
+    @partial(jax.jit, static_argnums=(0, 3, 4, 5, 6))
+    def _render_many(self, assets: Dict[str, Any], states, layout, color, chunk_size, masks):
+        renderer = self._with_assets(assets)
+
+        def render_one(state):
+            frame, segmentation = renderer._render(state)
+            frame = self.convert(frame, layout, color)
+            if not masks:
+                return frame
+            if layout != self.layout:
+                segmentation = aj.SegmentationMasks(*(mask.T for mask in segmentation))
+            return frame, segmentation
+
+        if chunk_size is None:
+            return jax.vmap(render_one)(states)
+        return jax.lax.map(render_one, states, batch_size=chunk_size)
+
+
+class PyGameRenderer:
+    """Shows the frames of an atraJaxis renderer in a Pygame window."""
+
+    def __init__(self, renderer: AtraJaxisRenderer, scaling_factor: int = 3, caption: Optional[str] = None):
+        """
+        Args:
+            renderer: The renderer producing the frames.
+            scaling_factor: Factor to scale the frames for display.
+            caption: Window caption.
+        """
+        self.renderer = renderer
+        self.scaling_factor = scaling_factor
+        self.caption = caption
+        self.viewer = None
+
+    def render(self, state) -> chex.Array:
+        """Renders the state, displays it and returns the RGB frame (WIDTH, HEIGHT, 3)."""
+        # the viewer shows (WIDTH, HEIGHT, 3) frames
+        frame = self.renderer.convert(self.renderer.render(state), layout="WHC", color="rgb")
+        if self.viewer is None:
+            pygame.init()
+            size = (int(frame.shape[0] * self.scaling_factor), int(frame.shape[1] * self.scaling_factor))
+            screen = pygame.display.set_mode(size)
+            if self.caption is not None:
+                pygame.display.set_caption(self.caption)
+            self.viewer = aj.PygameViewer(screen, self.scaling_factor)
+        self.viewer.update(frame)
+        return frame
+
+    def close(self):
+        """Closes the window."""
+        if self.viewer is not None:
+            pygame.display.quit()
+            self.viewer = None
@@ -1,9 +1,12 @@
 from pathlib import Path, PureWindowsPath
+import functools
+import json
 import os
 import numpy as np
 import jax.numpy as jnp
 import jax
 from functools import partial
+from typing import NamedTuple
 import pygame
 from jax import lax
 
@@ -22,17 +25,162 @@ class AgnosticPath(Path):
         return super().__new__(cls, *parts, **kwargs)
 
 
+LAYOUTS = ("WHC", "HWC")
+
+
+def xy(x, y, layout="WHC"):
+    """Orders a pair of (x, y) values, e.g. a shape, a position or slices, like the raster axes.
+
+    Rasters and sprites are (Width, Height, C) in the default "WHC" layout and
+    (Height, Width, C) in the "HWC" layout, where frames can be fed to conv nets and
+    video encoders without a transpose. For example `raster.at[xy(slice(0, 8), slice(None), layout)]`
+    selects the 8 leftmost columns in either layout.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout}, expected one of {LAYOUTS}")
+    return (x, y) if layout == "WHC" else (y, x)
+
+
+def to_layout(sprites, layout, indexed=False):
+    """Converts (W, H[, C]) sprites or rasters, optionally with leading frame axes, to `layout`.
+
+    Meant for assets at load time, e.g. module-level sprites that are kept in the
+    default "WHC" layout. Palette-indexed sprites have no channel axis (`indexed`).
+    """
+    if xy(0, 1, layout) == (0, 1):
+        return sprites
+    width_axis = -2 if indexed else -3
+    return jnp.swapaxes(sprites, width_axis, width_axis + 1)
+
+
+ATLAS_SUFFIX = ".atlas"
+_ATLAS_MAGIC = b"JAXATLAS"
+_ATLAS_ALIGNMENT = 64
+
+
+def pack_sprite_atlas(sprite_dir, atlas_path=None):
+    """Packs all .npy sprites below a directory into a single atlas file (build step).
+
+    The frames are validated and stored transposed to the renderer layout (W, H, C),
+    back to back and 64 byte aligned. A JSON header holds the offset, shape and dtype
+    of each frame, keyed by its path relative to `sprite_dir`. `loadFrame` reads
+    sprites from the atlas `<sprite_dir>.atlas` next to the directory if it exists,
+    so it has to be rebuilt after sprites are edited (newer .npy files are loaded
+    directly in the meantime).
+
+    Args:
+        sprite_dir: Directory with the sprites of a game, e.g. ".../sprites/seaquest".
+        atlas_path: Output path, defaults to `<sprite_dir>.atlas`.
+
+    Returns:
+        The path of the written atlas.
+    """
+    sprite_dir = Path(sprite_dir)
+    atlas_path = Path(atlas_path) if atlas_path is not None else sprite_dir.parent / (sprite_dir.name + ATLAS_SUFFIX)
+
+    entries, blobs = {}, []
+    offset = 0
+    for path in sorted(sprite_dir.rglob("*.npy")):
+        frame = np.load(path)
+        if frame.ndim != 3 or frame.shape[2] != 4:
+            raise ValueError(
+                f"Invalid frame format in {path}. Source .npy must be loadable with 3 dims and 4 channels."
+            )
+        frame = np.ascontiguousarray(np.transpose(frame, (1, 0, 2)))
+        entries[path.relative_to(sprite_dir).as_posix()] = {
+            "offset": offset,
+            "shape": list(frame.shape),
+            "dtype": frame.dtype.str,
+        }
+        padding = -frame.nbytes % _ATLAS_ALIGNMENT
+        blobs.append(frame.tobytes() + bytes(padding))
+        offset += frame.nbytes + padding
+
+    header = json.dumps(entries).encode()
+    header += b" " * (-(len(_ATLAS_MAGIC) + 8 + len(header)) % _ATLAS_ALIGNMENT)
+    with open(atlas_path, "wb") as f:
+        f.write(_ATLAS_MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    return atlas_path
+
+
+@functools.lru_cache(maxsize=None)
+def load_sprite_atlas(atlas_path):
+    """Memory-maps an atlas written by `pack_sprite_atlas`.
+
+    Only the header is read, frame data is paged in on first access and the pages are
+    shared between processes that map the same file.
+
+    Returns:
+        A dict mapping sprite names (paths relative to the sprite directory) to
+        read-only numpy arrays of shape (W, H, C).
+    """
+    with open(atlas_path, "rb") as f:
+        if f.read(len(_ATLAS_MAGIC)) != _ATLAS_MAGIC:
+            raise ValueError(f"{atlas_path} is not a sprite atlas")
+        header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        entries = json.loads(f.read(header_length))
+    if not entries:
+        return {}
+
+    data = np.memmap(atlas_path, dtype=np.uint8, mode="r", offset=len(_ATLAS_MAGIC) + 8 + header_length)
+    frames = {}
+    for name, entry in entries.items():
+        dtype = np.dtype(entry["dtype"])
+        num_bytes = int(np.prod(entry["shape"])) * dtype.itemsize
+        frames[name] = data[entry["offset"]:entry["offset"] + num_bytes].view(dtype).reshape(entry["shape"])
+    return frames
+
+
+@functools.lru_cache(maxsize=None)
+def _find_atlas(directory):
+    """Returns (atlas path, sprite directory) of the closest atlas above a directory, or None."""
+    directory = Path(directory)
+    if directory.parent == directory:
+        return None
+    atlas_path = directory.parent / (directory.name + ATLAS_SUFFIX)
+    if atlas_path.is_file():
+        return atlas_path, directory
+    return _find_atlas(directory.parent)
+
+
+def _load_from_atlas(fileName):
+    """Returns the (W, H, C) frame of a sprite file from its game's atlas, or None if unavailable."""
+    path = Path(fileName).resolve()
+    found = _find_atlas(path.parent)
+    if found is None:
+        return None
+    atlas_path, sprite_dir = found
+    # sprites edited after the atlas was built are loaded from their file
+    if path.is_file() and path.stat().st_mtime_ns > atlas_path.stat().st_mtime_ns:
+        return None
+    return load_sprite_atlas(atlas_path).get(path.relative_to(sprite_dir).as_posix())
+
+
 def loadFrame(fileName, transpose=True):
     """Loads a frame from .npy, ensuring output is (Width, Height, Channels).
 
+    If the game's sprites are packed into an atlas (see `pack_sprite_atlas`), the
+    frame is taken from the memory-mapped atlas instead of loading the file.
+
     Args:
         fileName: Path to the .npy file.
         transpose: If True (default), assumes source is (H, W, C) and transposes
                    to (W, H, C). If False, assumes source is already (W, H, C).
+                   The sprite files are (H, W, C), so False loads them as is for
+                   renderers in the "HWC" layout.
 
     Returns:
         JAX array of shape (Width, Height, 4).
     """
+    atlas_frame = _load_from_atlas(fileName)
+    if atlas_frame is not None:
+        # atlas frames are already transposed to (W, H, C)
+        return jnp.asarray(atlas_frame if transpose else np.transpose(atlas_frame, (1, 0, 2)))
+
     frame = jnp.load(fileName)
     if frame.ndim != 3 or frame.shape[2] != 4:
          raise ValueError(
@@ -47,48 +195,67 @@ def loadFrame(fileName, transpose=True):
         return frame
 
 
-@partial(jax.jit, static_argnames=["path_pattern", "num_chars"])
-def load_and_pad_digits(path_pattern, num_chars=10):
-    """Loads digit sprites, pads them to the max dimensions, assuming (W, H, C) format.
+ASSET_CACHE_SIZE = 128
 
-    Args:
-        path_pattern: String pattern for digit filenames (e.g., "./digits/{}.npy").
-        num_chars: Number of digits to load (e.g., 10 for 0-9).
 
-    Returns:
-        JAX array of shape (num_chars, max_Width, max_Height, 4).
-    """
-    digits = []
+@functools.lru_cache(maxsize=ASSET_CACHE_SIZE)
+def _load_and_pad_glyphs(path_pattern, num_chars, transpose):
+    """Host-side, cached part of `load_and_pad_digits`, returns a device array."""
+    glyphs = []
     max_width, max_height = 0, 0
 
-    # Load digits assuming loadFrame returns (W, H, C)
+    # Load glyphs as (W, H, C)
     for i in range(num_chars):
-        # Load with transpose=True (default) assuming source is H, W, C
-        digit = loadFrame(path_pattern.format(i))
-        max_width = max(max_width, digit.shape[0])   # Axis 0 is Width
-        max_height = max(max_height, digit.shape[1]) # Axis 1 is Height
-        digits.append(digit)
-
-    # Pad digits to max dimensions (W, H)
-    padded_digits = []
-    for digit in digits:
-        pad_w = max_width - digit.shape[0]  # Pad width (axis 0)
-        pad_h = max_height - digit.shape[1] # Pad height (axis 1)
+        glyph = np.asarray(loadFrame(path_pattern.format(i), transpose=transpose))
+        max_width = max(max_width, glyph.shape[0])   # Axis 0 is Width
+        max_height = max(max_height, glyph.shape[1]) # Axis 1 is Height
+        glyphs.append(glyph)
+
+    # Pad glyphs to max dimensions (W, H), centered
+    padded_glyphs = []
+    for glyph in glyphs:
+        pad_w = max_width - glyph.shape[0]  # Pad width (axis 0)
+        pad_h = max_height - glyph.shape[1] # Pad height (axis 1)
         pad_left = pad_w // 2
         pad_right = pad_w - pad_left
         pad_top = pad_h // 2
         pad_bottom = pad_h - pad_top
 
         # Padding order: ((pad_axis0_before, after), (pad_axis1_before, after), ...)
-        padded_digit = jnp.pad(
-            digit,
+        padded_glyphs.append(np.pad(
+            glyph,
             ((pad_left, pad_right), (pad_top, pad_bottom), (0, 0)), # Pad Width (axis 0), then Height (axis 1)
             mode="constant",
             constant_values=0,
-        )
-        padded_digits.append(padded_digit)
+        ))
+
+    return jax.device_put(np.stack(padded_glyphs))
+
+
+def load_and_pad_digits(path_pattern, num_chars=10, transpose=True):
+    """Loads digit sprites, pads them to the max dimensions, assuming (W, H, C) format.
+
+    Glyph sets are loaded and padded once on the host and kept in a process-wide
+    LRU cache (keyed by pattern, count and layout, `ASSET_CACHE_SIZE` entries), so
+    renderers sharing a font share one device array. Call `clear_asset_cache`
+    after editing sprites in a running process.
+
+    Args:
+        path_pattern: String pattern for digit filenames (e.g., "./digits/{}.npy").
+        num_chars: Number of digits to load (e.g., 10 for 0-9).
+        transpose: Passed on to `loadFrame`, True if the files are (H, W, C).
+
+    Returns:
+        JAX array of shape (num_chars, max_Width, max_Height, 4).
+    """
+    return _load_and_pad_glyphs(os.path.normpath(path_pattern), num_chars, transpose)
+
 
-    return jnp.array(padded_digits)
+def clear_asset_cache():
+    """Drops all cached glyph sets and memory-mapped sprite atlases."""
+    _load_and_pad_glyphs.cache_clear()
+    load_sprite_atlas.cache_clear()
+    _find_atlas.cache_clear()
 
 
 @jax.jit
@@ -96,12 +263,13 @@ def get_sprite_frame(frames, frame_idx, loop=True):
     """Extracts a single sprite frame from an animation sequence.
 
     Args:
-        frames: JAX array of shape (NumFrames, Width, Height, Channels).
+        frames: JAX array of shape (NumFrames, Width, Height, Channels)
+                or (NumFrames, Width, Height) for palette-indexed frames.
         frame_idx: Index of the frame to retrieve.
         loop: If True, frame_idx wraps around using modulo.
 
     Returns:
-        JAX array of shape (Width, Height, Channels) for the selected frame,
+        JAX array of shape (Width, Height[, Channels]) for the selected frame,
         or a blank frame if index is invalid and loop is False.
     """
     num_frames = frames.shape[0]
@@ -115,13 +283,8 @@ def get_sprite_frame(frames, frame_idx, loop=True):
         frame_idx_converted >= 0, frame_idx_converted < num_frames
     )
 
-    # Get dimensions from input array shape (N, W, H, C)
-    frame_width = frames.shape[1]    # Axis 1 is Width
-    frame_height = frames.shape[2]   # Axis 2 is Height
-    frame_channels = frames.shape[3] # Axis 3 is Channels
-    blank_frame = jnp.zeros(
-        (frame_width, frame_height, frame_channels), dtype=frames.dtype # W, H, C
-    )
+    # Frame shape (W, H, C), or (W, H) for palette-indexed frames
+    blank_frame = jnp.zeros(frames.shape[1:], dtype=frames.dtype)
 
     return jax.lax.cond(
         valid_frame,
@@ -131,141 +294,842 @@ def get_sprite_frame(frames, frame_idx, loop=True):
     )
 
 
-@jax.jit
-def render_at(raster, x, y, sprite_frame, flip_horizontal=False, flip_vertical=False):
+class SegmentationMasks(NamedTuple):
+    """Per-pixel object ids, written alongside the colors by `render_at` and `render_draw_list`.
+
+    Attributes:
+        instance: int16 array (Width, Height) with the instance id of the topmost object, 0 for none
+            ((Height, Width) in the HWC layout).
+        semantic: int16 array (Width, Height) with the class id of the topmost object, 0 for none.
+    """
+    instance: jnp.ndarray
+    semantic: jnp.ndarray
+
+
+def empty_masks(width, height, layout="WHC"):
+    """Creates `SegmentationMasks` of shape (width, height), or (height, width) for HWC, without any object."""
+    shape = xy(width, height, layout)
+    return SegmentationMasks(
+        instance=jnp.zeros(shape, dtype=jnp.int16),
+        semantic=jnp.zeros(shape, dtype=jnp.int16),
+    )
+
+
+def segmentation_ids(entity_counts):
+    """Assigns segmentation class and instance ids to the entity lists of an environment.
+
+    Class ids number the entity classes from 1 in the given order. Instance ids number
+    all entities from 1 in the same order, so instance id k belongs to row k - 1 of the
+    entity lists (e.g. of `obs_to_entity_boxes`) concatenated in this order.
+
+    Args:
+        entity_counts: Sequence of (class name, number of entities) pairs.
+
+    Returns:
+        A dict mapping each class name to a tuple (class id, instance ids of shape (count,)).
+    """
+    ids = {}
+    first_instance = 1
+    for class_id, (name, count) in enumerate(entity_counts, start=1):
+        ids[name] = (class_id, jnp.arange(first_instance, first_instance + count, dtype=jnp.int16))
+        first_instance += count
+    return ids
+
+
+@partial(jax.jit, static_argnames=["layout"])
+def render_at(
+    raster,
+    x,
+    y,
+    sprite_frame,
+    flip_horizontal=False,
+    flip_vertical=False,
+    masks=None,
+    instance_id=0,
+    class_id=0,
+    layout="WHC",
+):
     """Renders a sprite onto a raster at position (x, y) top-left, with clipping and optional flipping.
 
+    Only a sprite-sized window of the raster is read, blended and written back
+    (via dynamic slices), so the cost is proportional to the sprite, not the raster.
+
+    Palette-indexed sprites (Width, Height) are drawn onto a palette-indexed raster
+    (Width, Height) without blending, index 0 is transparent (see `to_indexed`).
+
     Args:
-        raster: JAX array of shape (Width, Height, 3/4) for the target image.
+        raster: JAX array of shape (Width, Height, 3/4) for the target image,
+                or (Width, Height) uint8 palette indices.
         x: Integer x coordinate (left edge, horizontal) for sprite placement.
         y: Integer y coordinate (top edge, vertical) for sprite placement.
-        sprite_frame: JAX array of shape (Width, Height, 4) containing RGB + alpha.
+        sprite_frame: JAX array of shape (Width, Height, 4) containing RGB + alpha,
+                      or (Width, Height) palette indices.
         flip_horizontal: Boolean flag to flip the sprite horizontally (left-right).
         flip_vertical: Boolean flag to flip the sprite vertically (top-bottom).
+        masks: Optional `SegmentationMasks`. The ids are written to the pixels covered by
+               the opaque sprite pixels, in the same window as the colors.
+        instance_id: Instance id written to `masks`.
+        class_id: Class id written to `masks`.
+        layout: "WHC", or "HWC" if raster, sprite and masks are (Height, Width[, C]) (static).
 
     Returns:
-        A new raster JAX array (Width, Height, 3/4) with the sprite rendered.
+        A new raster JAX array of the same shape with the sprite rendered,
+        or a tuple (raster, masks) if `masks` is given.
     """
     # --- Input Validation and Setup ---
+    # Placement is symmetric in the two raster axes, for HWC the coordinates and flips
+    # are swapped and the rest works on (axis 0, axis 1) as usual
+    x, y = xy(x, y, layout)
+    flip_horizontal, flip_vertical = xy(flip_horizontal, flip_vertical, layout)
     x, y = jnp.asarray(x, dtype=jnp.int32), jnp.asarray(y, dtype=jnp.int32)
     # Arrays are (Width, Height, Channels)
-    sprite_frame = jnp.asarray(sprite_frame) # Assume concrete shape (W, H, 4)
-    raster = jnp.asarray(raster)             # Assume shape (W, H, 3 or 4)
-    raster_width, raster_height, raster_channels = raster.shape
-    sprite_width, sprite_height, _ = sprite_frame.shape # Need concrete shape here
+    sprite_frame = jnp.asarray(sprite_frame) # Assume concrete shape (W, H, 4) or (W, H)
+    raster = jnp.asarray(raster)             # Assume shape (W, H, 3 or 4) or (W, H)
+    raster_width, raster_height = raster.shape[:2]
+    sprite_width, sprite_height = sprite_frame.shape[:2] # Need concrete shape here
+    indexed = sprite_frame.ndim == 2
+
+    # --- Window Extraction ---
+    # The window has the (static) size of the sprite, limited to the raster size.
+    # Its origin is clamped so that it always lies fully inside the raster; sprite
+    # pixels outside of the raster are masked out below.
+    window_width = min(sprite_width, raster_width)
+    window_height = min(sprite_height, raster_height)
+    window_x = jnp.clip(x, 0, raster_width - window_width)
+    window_y = jnp.clip(y, 0, raster_height - window_height)
+    channel_start = (0,) * (raster.ndim - 2)
+    window = lax.dynamic_slice(
+        raster, (window_x, window_y) + channel_start, (window_width, window_height) + raster.shape[2:]
+    ) # Shape (window_W, window_H[, C])
+
+    # --- Coordinate Calculation & Masking ---
+    # Position on the sprite for each window column (x) and row (y)
+    sprite_coord_x = window_x + jnp.arange(window_width) - x
+    sprite_coord_y = window_y + jnp.arange(window_height) - y
+
+    # Mask of window pixels that are covered by the sprite
+    sprite_bounds_mask = ((sprite_coord_x >= 0) & (sprite_coord_x < sprite_width))[:, None] & \
+                         ((sprite_coord_y >= 0) & (sprite_coord_y < sprite_height))[None, :]
+    # sprite_bounds_mask has shape (window_W, window_H)
 
     # --- Sprite Flipping ---
-    sprite = sprite_frame
-    # Flip horizontal means flipping along the Width axis (Axis 0)
-    sprite = jax.lax.cond(flip_horizontal, lambda s: jnp.flip(s, axis=0), lambda s: s, sprite)
-    # Flip vertical means flipping along the Height axis (Axis 1)
-    sprite = jax.lax.cond(flip_vertical,   lambda s: jnp.flip(s, axis=1), lambda s: s, sprite)
+    # Flipping mirrors the sprite coordinates along the Width (horizontal) or Height (vertical) axis
+    sprite_coord_x = jnp.where(flip_horizontal, sprite_width - 1 - sprite_coord_x, sprite_coord_x)
+    sprite_coord_y = jnp.where(flip_vertical, sprite_height - 1 - sprite_coord_y, sprite_coord_y)
+
+    # --- Gathering ---
+    # Clipped indices are safe, the corresponding pixels are masked out
+    sprite_coord_x = jnp.clip(sprite_coord_x, 0, sprite_width - 1)
+    sprite_coord_y = jnp.clip(sprite_coord_y, 0, sprite_height - 1)
+    gathered_sprite_rgba = jnp.take(jnp.take(sprite_frame, sprite_coord_x, axis=0), sprite_coord_y, axis=1)
+    # gathered_sprite_rgba has shape (window_W, window_H, 4), or (window_W, window_H) if indexed
+
+    if masks is not None:
+        opaque = gathered_sprite_rgba != 0 if indexed else gathered_sprite_rgba[..., 3] > 0
+        masks = _write_mask_window(
+            masks, sprite_bounds_mask & opaque, window_x, window_y, instance_id, class_id
+        )
 
-    # --- Coordinate Calculation & Masking ---
-    # Create coordinate grids for the *entire* raster (W, H)
-    # 'ij' indexing: xx varies along axis 0 (Width), yy varies along axis 1 (Height)
-    raster_xx, raster_yy = jnp.meshgrid(
-        jnp.arange(raster_width),   # X coords (0..W-1)
-        jnp.arange(raster_height),  # Y coords (0..H-1)
-        indexing='ij'
-    ) # raster_xx shape (W, H), raster_yy shape (W, H)
-
-    # Calculate corresponding coordinates relative to the sprite's origin (top-left)
-    sprite_coord_x = raster_xx - x # X position on sprite for each raster pixel
-    sprite_coord_y = raster_yy - y # Y position on sprite for each raster pixel
-
-    # Create mask: identifies raster pixels (at raster_xx, raster_yy) that
-    # correspond to valid coordinates *within* the sprite's bounds (0..W-1, 0..H-1)
-    sprite_bounds_mask = (sprite_coord_x >= 0) & (sprite_coord_x < sprite_width) & \
-                         (sprite_coord_y >= 0) & (sprite_coord_y < sprite_height)
-    # sprite_bounds_mask has shape (W, H)
-
-    # --- Safe Gathering using Padding ---
-    # Pad the sprite (W, H, C) to handle potential out-of-bounds access.
-    pad_width_spec = ((1, 1), (1, 1), (0, 0)) # Pad W (axis 0), then H (axis 1)
-    sprite_padded = jnp.pad(sprite, pad_width_spec, mode='constant', constant_values=0)
-    # sprite_padded has shape (W+2, H+2, 4)
-
-    # Adjust coordinates to index into the *padded* sprite
-    sprite_coord_x_padded = sprite_coord_x + 1 # X index for padded sprite
-    sprite_coord_y_padded = sprite_coord_y + 1 # Y index for padded sprite
-
-    # Gather RGBA values from the padded sprite using calculated indices.
-    # Indexing for (W, H, C) array is [x_index, y_index]
-    gathered_sprite_rgba = sprite_padded[sprite_coord_x_padded, sprite_coord_y_padded]
-    # gathered_sprite_rgba has shape (W, H, 4)
-
-    # --- Blending Calculation (for all raster pixels) ---
-    gathered_sprite_rgb = gathered_sprite_rgba[..., :3].astype(jnp.float32)
-    gathered_sprite_alpha = (gathered_sprite_rgba[..., 3:].astype(jnp.float32) / 255.0) # Shape (W, H, 1)
-
-    # Get current raster RGB (shape W, H, C)
-    current_raster_rgb = raster[..., :raster_channels].astype(jnp.float32)
-
-    # Perform alpha blending calculation everywhere
-    blended_rgb = gathered_sprite_rgb * gathered_sprite_alpha + \
-                  current_raster_rgb * (1.0 - gathered_sprite_alpha)
-    # blended_rgb has shape (W, H, C)
-
-    # --- Apply Mask with jnp.where ---
-    final_mask_broadcasted = sprite_bounds_mask[..., None] # Shape (W, H, 1)
-
-    # Where the mask is True (pixel corresponds to valid sprite area), select blended_rgb.
-    # Where the mask is False (pixel outside sprite area), select the original current_raster_rgb.
-    new_raster_float = jnp.where(
-        final_mask_broadcasted, # Condition (W, H, 1)
-        blended_rgb,            # Value if True (W, H, C)
-        current_raster_rgb      # Value if False (W, H, C)
+    if indexed:
+        # --- Palette indices: plain select, index 0 is transparent ---
+        new_window = jnp.where(
+            sprite_bounds_mask & (gathered_sprite_rgba != 0),
+            gathered_sprite_rgba.astype(raster.dtype),
+            window,
+        )
+        raster = lax.dynamic_update_slice(raster, new_window, (window_x, window_y))
+        return raster if masks is None else (raster, masks)
+
+    # --- Binary Alpha Fast Path ---
+    # Atari sprites are fully opaque or fully transparent per pixel, those are drawn with
+    # an integer select. Float blending is only needed for sprites with partial alpha.
+    # The check covers the whole sprite, so it stays unbatched (and is usually constant
+    # folded) when the sprite itself is a constant.
+    sprite_alpha = sprite_frame[..., 3]
+    has_partial_alpha = jnp.any((sprite_alpha > 0) & (sprite_alpha < 255))
+
+    def select_window(sprite_rgba, current_window):
+        opaque_mask = sprite_bounds_mask & (sprite_rgba[..., 3] > 0) # Shape (window_W, window_H)
+        return jnp.where(
+            opaque_mask[..., None],
+            sprite_rgba[..., :3].astype(raster.dtype),
+            current_window,
+        )
+
+    def blend_window(sprite_rgba, current_window):
+        # --- Blending Calculation (for the window) ---
+        gathered_sprite_rgb = sprite_rgba[..., :3].astype(jnp.float32)
+        gathered_sprite_alpha = (sprite_rgba[..., 3:].astype(jnp.float32) / 255.0) # Shape (window_W, window_H, 1)
+
+        current_window_rgb = current_window.astype(jnp.float32)
+
+        blended_rgb = gathered_sprite_rgb * gathered_sprite_alpha + \
+                      current_window_rgb * (1.0 - gathered_sprite_alpha)
+
+        # --- Apply Mask ---
+        return jnp.where(
+            sprite_bounds_mask[..., None], # Condition (window_W, window_H, 1)
+            blended_rgb,                   # Value if True
+            current_window_rgb             # Value if False
+        ).astype(raster.dtype)
+
+    # --- Write the window back ---
+    new_window = lax.cond(has_partial_alpha, blend_window, select_window, gathered_sprite_rgba, window)
+
+    raster = lax.dynamic_update_slice(raster, new_window, (window_x, window_y) + channel_start)
+    return raster if masks is None else (raster, masks)
+
+
+def _write_mask_window(masks, covered, window_x, window_y, instance_id, class_id):
+    """Writes the ids into the covered pixels of a window of the masks."""
+    def write(mask, object_id):
+        window = lax.dynamic_slice(mask, (window_x, window_y), covered.shape)
+        window = jnp.where(covered, jnp.asarray(object_id, dtype=mask.dtype), window)
+        return lax.dynamic_update_slice(mask, window, (window_x, window_y))
+
+    return SegmentationMasks(write(masks.instance, instance_id), write(masks.semantic, class_id))
+
+
+def bake_background(raster, placements, layout="WHC"):
+    """Composites static sprites once into a background raster.
+
+    Meant to be called when a renderer is constructed, so that `render` can start from
+    the pre-composited array (a plain copy or gather) instead of blending full-screen
+    backgrounds and static HUD elements every frame.
+
+    Args:
+        raster: The initial raster, e.g. `jnp.zeros((WIDTH, HEIGHT, 3))`.
+        placements: A list of (x, y, sprite_frame) tuples, drawn in order with `render_at`.
+        layout: Layout of the raster and sprites, "WHC" or "HWC".
+
+    Returns:
+        The composited raster, same shape and dtype as `raster`.
+    """
+    for x, y, sprite_frame in placements:
+        raster = render_at(raster, x, y, sprite_frame, layout=layout)
+    return raster
+
+
+class SpriteAtlas(NamedTuple):
+    """All sprite frames of a game, padded to a common size and stacked for batched rendering.
+
+    Attributes:
+        frames: JAX array of shape (NumSprites, maxWidth, maxHeight, 4),
+                or (NumSprites, maxWidth, maxHeight) for palette-indexed sprites.
+        sizes: int32 JAX array of shape (NumSprites, 2) with the (Width, Height) of each
+               sprite before padding. Flipping mirrors a sprite within this size.
+    """
+    frames: jnp.ndarray
+    sizes: jnp.ndarray
+
+
+class DrawList(NamedTuple):
+    """A batch of sprite draws, all fields are JAX arrays of shape (N,).
+
+    Attributes:
+        sprite_id: Index of the sprite in the `SpriteAtlas`.
+        x: x coordinate (left edge) of the sprite.
+        y: y coordinate (top edge) of the sprite.
+        flip_horizontal: Whether the sprite is flipped left-right.
+        flip_vertical: Whether the sprite is flipped top-bottom.
+        visible: Entries with False are skipped.
+        z: Draw order, higher values are drawn on top. Entries with the same z are
+           drawn in list order, i.e. later entries end up on top (like sequential `render_at` calls).
+        instance_id: Instance id written to the `SegmentationMasks`, 0 for none.
+        class_id: Class id written to the `SegmentationMasks`, 0 for none.
+    """
+    sprite_id: jnp.ndarray
+    x: jnp.ndarray
+    y: jnp.ndarray
+    flip_horizontal: jnp.ndarray
+    flip_vertical: jnp.ndarray
+    visible: jnp.ndarray
+    z: jnp.ndarray
+    instance_id: jnp.ndarray
+    class_id: jnp.ndarray
+
+
+def build_atlas(sprites, indexed=False):
+    """Stacks sprites (or animation sequences) into a `SpriteAtlas`.
+
+    Args:
+        sprites: A list of JAX arrays, each either a single frame of shape (W, H, 4)
+                 or an animation sequence of shape (NumFrames, W, H, 4).
+        indexed: If True, the sprites are palette-indexed, i.e. frames of shape (W, H)
+                 and sequences of shape (NumFrames, W, H).
+
+    Returns:
+        A tuple (atlas, offsets) where `offsets[i]` is the sprite id of the first frame
+        of `sprites[i]` in the atlas (frame k of a sequence has id offsets[i] + k).
+    """
+    frame_ndim = 2 if indexed else 3
+    sequences = [s[None] if s.ndim == frame_ndim else s for s in sprites]
+    max_width = max(s.shape[1] for s in sequences)
+    max_height = max(s.shape[2] for s in sequences)
+
+    frames, sizes, offsets = [], [], []
+    num_frames = 0
+    for sequence in sequences:
+        pad_spec = ((0, 0), (0, max_width - sequence.shape[1]), (0, max_height - sequence.shape[2]))
+        pad_spec += ((0, 0),) * (sequence.ndim - 3)
+        frames.append(jnp.pad(sequence, pad_spec, mode="constant", constant_values=0))
+        sizes.extend([(sequence.shape[1], sequence.shape[2])] * sequence.shape[0])
+        offsets.append(num_frames)
+        num_frames += sequence.shape[0]
+
+    atlas = SpriteAtlas(
+        frames=jnp.concatenate(frames, axis=0),
+        sizes=jnp.array(sizes, dtype=jnp.int32),
+    )
+    return atlas, tuple(offsets)
+
+
+def make_draw_list(
+    sprite_id, x, y, visible=True, flip_horizontal=False, flip_vertical=False, z=0, instance_id=0, class_id=0
+):
+    """Creates a `DrawList`, broadcasting all arguments to a common shape (N,).
+
+    Returns:
+        A `DrawList` with N entries (N is 1 if all arguments are scalars).
+    """
+    fields = jnp.broadcast_arrays(
+        jnp.asarray(sprite_id, dtype=jnp.int32),
+        jnp.asarray(x, dtype=jnp.int32),
+        jnp.asarray(y, dtype=jnp.int32),
+        jnp.asarray(flip_horizontal, dtype=jnp.bool_),
+        jnp.asarray(flip_vertical, dtype=jnp.bool_),
+        jnp.asarray(visible, dtype=jnp.bool_),
+        jnp.asarray(z, dtype=jnp.int32),
+        jnp.asarray(instance_id, dtype=jnp.int16),
+        jnp.asarray(class_id, dtype=jnp.int16),
     )
+    return DrawList(*(jnp.atleast_1d(f) for f in fields))
 
-    # Cast final result back to original raster dtype
-    new_raster = new_raster_float.astype(raster.dtype) # Shape (W, H, C)
 
-    return new_raster
+def concat_draw_lists(*draw_lists):
+    """Concatenates draw lists, keeping their order."""
+    return DrawList(*(jnp.concatenate(fields) for fields in zip(*draw_lists)))
+
+
+@partial(jax.jit, static_argnames=["layout"])
+def render_draw_list(raster, draw_list, atlas, masks=None, layout="WHC"):
+    """Composites all entries of a draw list onto the raster in a single pass.
+
+    Instead of one `render_at` per entry, every sprite pixel of every entry is computed
+    at once: the covering entry with the highest draw order is found per raster pixel
+    via a scatter-max into a depth buffer, then its colors are scattered into the raster.
+    The result equals drawing the visible entries one by one with `render_at` in draw
+    order, as long as the sprites have binary alpha (only the topmost sprite of a pixel
+    is blended with the raster). Palette-indexed atlases are drawn onto palette-indexed
+    rasters (Width, Height) without blending.
+
+    Args:
+        raster: JAX array of shape (Width, Height, 3/4) for the target image,
+                or (Width, Height) uint8 palette indices.
+        draw_list: A `DrawList` with N entries.
+        atlas: The `SpriteAtlas` the sprite ids refer to.
+        masks: Optional `SegmentationMasks`. The ids of the topmost entry of each covered
+               pixel are looked up from the depth buffer of the compositing pass.
+        layout: "WHC", or "HWC" if raster, atlas and masks are (Height, Width[, C]) (static).
+
+    Returns:
+        A new raster JAX array (Width, Height, 3/4) with the sprites rendered,
+        or a tuple (raster, masks) if `masks` is given.
+    """
+    if layout == "HWC":
+        # the positions and flips refer to x and y, the raster axes are swapped
+        draw_list = draw_list._replace(
+            x=draw_list.y,
+            y=draw_list.x,
+            flip_horizontal=draw_list.flip_vertical,
+            flip_vertical=draw_list.flip_horizontal,
+        )
+    raster = jnp.asarray(raster)
+    raster_width, raster_height = raster.shape[:2]
+    max_width, max_height = atlas.frames.shape[1:3]
+    indexed = atlas.frames.ndim == 3
+    num_entries = draw_list.sprite_id.shape[0]
+
+    # --- Draw Order ---
+    # Rank of each entry when sorted by z, ties are resolved by position in the list
+    entry_index = jnp.arange(num_entries)
+    order = jnp.lexsort((entry_index, draw_list.z))
+    rank = jnp.zeros(num_entries, dtype=jnp.int32).at[order].set(entry_index.astype(jnp.int32))
+
+    # --- Sprite Pixels of all Entries ---
+    # Shapes (N, maxW, maxH) via broadcasting
+    local_x = jnp.arange(max_width)[None, :, None]
+    local_y = jnp.arange(max_height)[None, None, :]
+    sprite_width = atlas.sizes[draw_list.sprite_id, 0][:, None, None]
+    sprite_height = atlas.sizes[draw_list.sprite_id, 1][:, None, None]
+
+    sprite_coord_x = jnp.where(draw_list.flip_horizontal[:, None, None], sprite_width - 1 - local_x, local_x)
+    sprite_coord_y = jnp.where(draw_list.flip_vertical[:, None, None], sprite_height - 1 - local_y, local_y)
+    pixels = atlas.frames[
+        draw_list.sprite_id[:, None, None],
+        jnp.clip(sprite_coord_x, 0, max_width - 1),
+        jnp.clip(sprite_coord_y, 0, max_height - 1),
+    ] # Shape (N, maxW, maxH, 4), or (N, maxW, maxH) if indexed
+    opaque = pixels != 0 if indexed else pixels[..., 3] > 0
+
+    pixel_x = draw_list.x[:, None, None] + local_x
+    pixel_y = draw_list.y[:, None, None] + local_y
+    covered = (
+        draw_list.visible[:, None, None]
+        & (local_x < sprite_width) & (local_y < sprite_height)
+        & opaque
+        & (pixel_x >= 0) & (pixel_x < raster_width)
+        & (pixel_y >= 0) & (pixel_y < raster_height)
+    )
+
+    # --- Depth Buffer ---
+    # Uncovered pixels are moved out of bounds and dropped by the scatters
+    pixel_x = jnp.where(covered, pixel_x, raster_width)
+    pixel_y = jnp.where(covered, pixel_y, raster_height)
+    entry_rank = jnp.broadcast_to(rank[:, None, None], covered.shape)
+    depth = jnp.full((raster_width, raster_height), -1, dtype=jnp.int32)
+    depth = depth.at[pixel_x, pixel_y].max(entry_rank, mode="drop")
+
+    on_top = covered & (depth.at[pixel_x, pixel_y].get(mode="fill", fill_value=-1) == entry_rank)
+    pixel_x = jnp.where(on_top, pixel_x, raster_width)
+
+    if masks is not None:
+        # The depth buffer already holds the rank of the topmost entry per pixel,
+        # the ids are looked up from it instead of being scattered
+        topmost_entry = order[jnp.maximum(depth, 0)]
+        def write(mask, object_ids):
+            return jnp.where(depth >= 0, object_ids[topmost_entry].astype(mask.dtype), mask)
+
+        masks = SegmentationMasks(
+            write(masks.instance, draw_list.instance_id), write(masks.semantic, draw_list.class_id)
+        )
+
+    if indexed:
+        raster = raster.at[pixel_x, pixel_y].set(pixels.astype(raster.dtype), mode="drop")
+        return raster if masks is None else (raster, masks)
+
+    # --- Blending (topmost sprite only) ---
+    # Float blending is only needed if the atlas contains sprites with partial alpha
+    atlas_alpha = atlas.frames[..., 3]
+    has_partial_alpha = jnp.any((atlas_alpha > 0) & (atlas_alpha < 255))
+
+    def select_colors(pixel_x, pixel_y, pixels):
+        return pixels[..., :3].astype(raster.dtype)
+
+    def blend_colors(pixel_x, pixel_y, pixels):
+        sprite_rgb = pixels[..., :3].astype(jnp.float32)
+        sprite_alpha = pixels[..., 3:].astype(jnp.float32) / 255.0
+        current_rgb = raster.at[pixel_x, pixel_y, :3].get(mode="fill", fill_value=0).astype(jnp.float32)
+        return (sprite_rgb * sprite_alpha + current_rgb * (1.0 - sprite_alpha)).astype(raster.dtype)
+
+    colors = lax.cond(has_partial_alpha, blend_colors, select_colors, pixel_x, pixel_y, pixels)
+
+    raster = raster.at[pixel_x, pixel_y, :3].set(colors, mode="drop")
+    return raster if masks is None else (raster, masks)
+
+
+def scale_sprite(sprite, scale):
+    """Resizes sprites by a (horizontal, vertical) scale factor for direct downsampled rendering.
+
+    Meant to be called at asset-load time. The sprite is resized with the same
+    antialiased bilinear filter as `resize_raster`, in premultiplied alpha so that
+    transparent pixels do not bleed into the sprite colors. Edges end up with partial
+    alpha and are blended by `render_at`.
+
+    Args:
+        sprite: RGBA array of shape (..., W, H, 4).
+        scale: Tuple (scale_x, scale_y), e.g. (84 / 160, 84 / 210).
+
+    Returns:
+        A uint8 JAX array of shape (..., ceil(W * scale_x), ceil(H * scale_y), 4).
+    """
+    sprite = jnp.asarray(sprite, dtype=jnp.float32)
+    width, height = sprite.shape[-3:-1]
+    scaled_width = max(int(np.ceil(width * scale[0])), 1)
+    scaled_height = max(int(np.ceil(height * scale[1])), 1)
+
+    alpha = sprite[..., 3:] / 255.0
+    premultiplied = jnp.concatenate([sprite[..., :3] * alpha, alpha], axis=-1)
+    spatial_dims = (sprite.ndim - 3, sprite.ndim - 2)
+    scaled = jax.image.scale_and_translate(
+        premultiplied,
+        sprite.shape[:-3] + (scaled_width, scaled_height, 4),
+        spatial_dims,
+        jnp.array(scale, dtype=jnp.float32),
+        jnp.zeros(2, dtype=jnp.float32),
+        method="linear",
+    )
+    scaled_alpha = jnp.clip(scaled[..., 3:], 0.0, 1.0)
+    scaled_rgb = scaled[..., :3] / jnp.maximum(scaled_alpha, 1e-6)
+    scaled = jnp.concatenate([scaled_rgb, scaled_alpha * 255.0], axis=-1)
+    return jnp.clip(jnp.round(scaled), 0, 255).astype(jnp.uint8)
+
+
+def scale_atlas(atlas, scale):
+    """Applies `scale_sprite` to all frames of a `SpriteAtlas` (sizes are scaled accordingly)."""
+    scaled_sizes = jnp.ceil(atlas.sizes * jnp.array(scale)).astype(jnp.int32)
+    return SpriteAtlas(frames=scale_sprite(atlas.frames, scale), sizes=jnp.maximum(scaled_sizes, 1))
+
+
+def scale_position(position, scale):
+    """Maps a coordinate (or array of coordinates) of the full-size screen to a scaled raster."""
+    return jnp.round(jnp.asarray(position, dtype=jnp.float32) * scale).astype(jnp.int32)
+
+
+def scale_draw_list(draw_list, scale):
+    """Maps the positions of a `DrawList` to a raster scaled by (scale_x, scale_y)."""
+    return draw_list._replace(
+        x=scale_position(draw_list.x, scale[0]),
+        y=scale_position(draw_list.y, scale[1]),
+    )
+
+
+@partial(jax.jit, static_argnames=["shape"])
+def resize_raster(raster, shape):
+    """Resizes a (W, H, C) raster to shape (W', H') with an antialiased bilinear filter.
+
+    This is the reference for direct downsampled rendering: rendering with scaled
+    sprites (`scale_sprite`) and positions (`scale_position`) approximates rendering
+    at full size followed by `resize_raster`.
+    """
+    raster = jnp.asarray(raster)
+    resized = jax.image.resize(raster.astype(jnp.float32), tuple(shape) + raster.shape[2:], method="bilinear")
+    if jnp.issubdtype(raster.dtype, jnp.integer):
+        resized = jnp.clip(jnp.round(resized), 0, 255)
+    return resized.astype(raster.dtype)
+
+
+def build_palette(sprites, colors=()):
+    """Collects the colors used by a set of sprites into a palette (host-side, outside of jit).
+
+    Index 0 is reserved: it is transparent in indexed sprites and maps to black, the
+    color rasters are cleared with. Atari frames only use a handful of colors, so a
+    palette of at most 256 entries is enough for a game.
+
+    Args:
+        sprites: A list of RGBA arrays of shape (..., W, H, 4).
+        colors: Additional RGB(A) colors that should be part of the palette (e.g. bar colors).
+
+    Returns:
+        A uint8 numpy array of shape (NumColors, 3).
+    """
+    used = [np.asarray(sprite).reshape(-1, 4) for sprite in sprites]
+    used = [pixels[pixels[:, 3] > 0, :3] for pixels in used]
+    used += [np.asarray(color, dtype=np.uint8)[None, :3] for color in colors]
+    unique = np.unique(np.concatenate(used, axis=0), axis=0)
+    palette = np.concatenate([np.zeros((1, 3), dtype=np.uint8), unique.astype(np.uint8)], axis=0)
+    if palette.shape[0] > 256:
+        raise ValueError(f"Palette has {palette.shape[0]} colors, at most 256 fit into uint8 indices")
+    return palette
+
+
+def palette_index(palette, color):
+    """Returns the index of an RGB(A) color in the palette (host-side).
+
+    A fully transparent RGBA color maps to the reserved index 0.
+    """
+    color = np.asarray(color, dtype=np.uint8)
+    if color.shape[0] == 4 and color[3] == 0:
+        return 0
+    matches = np.nonzero(np.all(np.asarray(palette)[1:] == color[:3], axis=1))[0]
+    if matches.size == 0:
+        raise ValueError(f"Color {tuple(color)} is not part of the palette")
+    return int(matches[0]) + 1
+
+
+def to_indexed(sprite, palette):
+    """Converts RGBA sprites to palette indices (host-side, outside of jit).
+
+    Fully transparent pixels become index 0. Indexed sprites cannot express partial
+    alpha, such sprites have to be rendered in RGB mode.
+
+    Args:
+        sprite: RGBA array of shape (..., W, H, 4).
+        palette: Palette as returned by `build_palette`.
+
+    Returns:
+        A uint8 JAX array of shape (..., W, H).
+    """
+    sprite = np.asarray(sprite)
+    alpha = sprite[..., 3]
+    if np.any((alpha > 0) & (alpha < 255)):
+        raise ValueError("Sprites with partial alpha cannot be converted to palette indices")
+    palette = np.asarray(palette)
+    # skip the reserved entry 0 when matching colors
+    matches = np.all(sprite[..., None, :3] == palette[None, 1:], axis=-1)
+    opaque = alpha > 0
+    if np.any(opaque & ~matches.any(axis=-1)):
+        raise ValueError("Sprite uses colors that are not part of the palette")
+    indices = np.where(opaque, matches.argmax(axis=-1) + 1, 0)
+    return jnp.asarray(indices, dtype=jnp.uint8)
+
+
+@jax.jit
+def apply_palette(raster, palette):
+    """Expands a palette-indexed raster via a final lookup.
+
+    Args:
+        raster: uint8 palette indices of shape (..., W, H).
+        palette: Array of shape (NumColors, C), e.g. the RGB palette from `build_palette`
+                 or a single-channel grayscale palette.
+
+    Returns:
+        Array of shape (..., W, H, C) with the dtype of the palette.
+    """
+    return jnp.asarray(palette)[raster]
+
+
+def make_batched_render(render_fn):
+    """Compiles a vmapped render function that reuses a donated frame buffer.
+
+    Within the compiled render the raster is updated in place (the `render_at` style
+    helpers only write sprite-sized windows with dynamic update slices). Donating the
+    frames of the previous call lets XLA write the new batch into the same memory, so
+    steady-state rendering of a large batch holds one frame batch instead of two.
+
+    Args:
+        render_fn: A (state) -> raster function, e.g. `renderer.render`.
+
+    Returns:
+        A function (states, frames=None) -> frames. `states` is a batched state and
+        `frames` the (now invalidated) output of the previous call, or None for the first call.
+    """
+    render_batch = jax.jit(jax.vmap(render_fn))
+
+    @partial(jax.jit, donate_argnums=(1,))
+    def render_into(states, frames):
+        del frames # only donated, the output is written into its buffer
+        return jax.vmap(render_fn)(states)
+
+    def batched_render(states, frames=None):
+        if frames is None:
+            return render_batch(states)
+        return render_into(states, frames)
+
+    return batched_render
+
+
+@partial(jax.jit, static_argnames=["factor"])
+def upscale_raster(raster, factor):
+    """Upscales a raster by an integer factor with nearest-neighbour sampling on the device.
+
+    Args:
+        raster: JAX array of shape (Width, Height, ...).
+        factor: Integer scaling factor (static).
+
+    Returns:
+        The raster of shape (Width * factor, Height * factor, ...).
+    """
+    width, height = raster.shape[:2]
+    rest = raster.shape[2:]
+    expanded = jnp.broadcast_to(
+        raster[:, None, :, None], (width, factor, height, factor) + rest
+    )
+    return expanded.reshape((width * factor, height * factor) + rest)
+
+
+@partial(jax.jit, static_argnames=["factor", "shifts", "alpha_mask"])
+def _upscale_and_pack(raster, factor, shifts, alpha_mask):
+    """Upscales an RGB raster and packs it into 32 bit pixels of a surface format."""
+    raster = raster.astype(jnp.uint32)
+    pixels = jnp.uint32(alpha_mask)
+    for channel, shift in enumerate(shifts[:3]):
+        pixels = pixels | (raster[..., channel] << shift)
+    return upscale_raster(pixels, factor)
+
+
+class PygameViewer:
+    """Displays rasters on a Pygame screen without per-frame surface allocations.
+
+    The raster is upscaled by the integer part of the scaling factor on the device and
+    written into a persistent surface with `blit_array`. For 32 bit surfaces the pixels
+    are packed into the surface format on the device as well, so the blit is a plain copy.
+    Only a fractional remainder of the scaling factor is handled by Pygame, into a
+    reusable destination surface.
+    """
+
+    def __init__(self, pygame_screen, scaling_factor=3):
+        """
+        Args:
+            pygame_screen: The Pygame screen surface.
+            scaling_factor: Factor to scale the raster for display.
+        """
+        self.screen = pygame_screen
+        self.scaling_factor = scaling_factor
+        self.upscale = max(int(scaling_factor), 1)
+        self._frame_surface = None
+        self._scaled_surface = None
+
+    def _surface(self, surface, size):
+        if surface is None or surface.get_size() != size:
+            # same pixel format as the screen, so blitting to it needs no conversion
+            surface = pygame.Surface(size, 0, self.screen)
+        return surface
+
+    def _write_frame(self, raster):
+        size = (raster.shape[0] * self.upscale, raster.shape[1] * self.upscale)
+        self._frame_surface = self._surface(self._frame_surface, size)
+        surface = self._frame_surface
+        if surface.get_bitsize() == 32 and not any(surface.get_losses()[:3]):
+            frame = _upscale_and_pack(
+                raster[..., :3], self.upscale, surface.get_shifts(), surface.get_masks()[3]
+            )
+        else:
+            frame = upscale_raster(raster[..., :3].astype(jnp.uint8), self.upscale)
+        # zero-copy on the CPU backend, a single device to host transfer otherwise
+        pygame.surfarray.blit_array(surface, np.asarray(frame))
+        return surface
+
+    def update(self, raster):
+        """Draws the raster (Width, Height, 3/4) to the screen and flips the display."""
+        surface = self._write_frame(raster)
+
+        target_size = (
+            int(raster.shape[0] * self.scaling_factor),
+            int(raster.shape[1] * self.scaling_factor),
+        )
+        if target_size != surface.get_size():
+            self._scaled_surface = self._surface(self._scaled_surface, target_size)
+            pygame.transform.scale(surface, target_size, self._scaled_surface)
+            surface = self._scaled_surface
+
+        if surface.get_size() != self.screen.get_size():
+            self.screen.fill((0, 0, 0))
+        self.screen.blit(surface, (0, 0))
+        pygame.display.flip()
+
+
+_pygame_viewer = None
 
 
 def update_pygame(pygame_screen, raster, SCALING_FACTOR=3, WIDTH=400, HEIGHT=300):
     """Updates the Pygame display with the rendered raster.
 
+    Reuses a `PygameViewer` for the screen between calls, so the surfaces are only
+    allocated once.
+
     Args:
         pygame_screen: The Pygame screen surface.
         raster: JAX array of shape (Width, Height, 3/4) containing the image data.
         SCALING_FACTOR: Factor to scale the raster for display.
-        WIDTH: Expected width of the input raster (used for scaling calculation).
-        HEIGHT: Expected height of the input raster (used for scaling calculation).
+        WIDTH: Expected width of the input raster (unused, the raster shape is used).
+        HEIGHT: Expected height of the input raster (unused, the raster shape is used).
     """
-    pygame_screen.fill((0, 0, 0))
+    global _pygame_viewer
+    if (
+        _pygame_viewer is None
+        or _pygame_viewer.screen is not pygame_screen
+        or _pygame_viewer.scaling_factor != SCALING_FACTOR
+    ):
+        _pygame_viewer = PygameViewer(pygame_screen, SCALING_FACTOR)
+    _pygame_viewer.update(raster)
 
-    # Convert JAX array (W, H, C) to NumPy (W, H, C)
-    raster_np = np.array(raster)
-    raster_np = raster_np.astype(np.uint8)
 
-    # Pygame surface needs (W, H). make_surface expects (W, H, C) correctly.
-    frame_surface = pygame.surfarray.make_surface(raster_np)
+MAX_LABEL_WIDTH = 100
+MAX_LABEL_HEIGHT = 20
 
-    # Pygame scale expects target (width, height)
-    target_width_px = int(WIDTH * SCALING_FACTOR)
-    target_height_px = int(HEIGHT * SCALING_FACTOR)
-    # Optional: Adjust scaling if raster size differs from constants
-    if raster_np.shape[0] != WIDTH or raster_np.shape[1] != HEIGHT:
-        target_width_px = int(raster_np.shape[0] * SCALING_FACTOR)
-        target_height_px = int(raster_np.shape[1] * SCALING_FACTOR)
 
+@partial(jax.jit, static_argnames=["spacing", "layout"])
+def render_glyph_run(raster, x, y, glyph_ids, glyphs, spacing, count=None, layout="WHC"):
+    """Renders a horizontal run of equally sized glyphs in a single windowed pass.
 
-    frame_surface_scaled = pygame.transform.scale(
-        frame_surface, (target_width_px, target_height_px)
-    )
+    Glyph i is drawn at (x + i * spacing, y). Instead of one `render_at` per glyph, a
+    window spanning the whole run is read once; for every window column the glyphs
+    covering it are looked up (at most ceil(glyph width / spacing), usually one) and
+    composited in order, so the result equals drawing the glyphs one after another.
 
-    pygame_screen.blit(frame_surface_scaled, (0, 0))
-    pygame.display.flip()
+    Args:
+        raster: Target raster (W, H, C), or (W, H) palette indices.
+        x: Left x coordinate of the first glyph.
+        y: Top y coordinate of the glyphs.
+        glyph_ids: 1D JAX array of glyph indices, its (static) length is the maximum run length.
+        glyphs: JAX array of glyph sprites (NumGlyphs, W, H, C), or (NumGlyphs, W, H) palette indices.
+        spacing: Static, positive horizontal spacing between glyph origins.
+        count: Optional number of glyphs to draw from the start of the run (may be traced).
+        layout: "WHC", or "HWC" if raster and glyphs are (Height, Width[, C]) (static).
 
+    Returns:
+        Updated raster.
+    """
+    if spacing <= 0:
+        raise ValueError(f"spacing has to be positive, got {spacing}")
+    raster = jnp.asarray(raster)
+    glyphs = jnp.asarray(glyphs)
+    if layout == "HWC":
+        # the glyphs are small, compositing works on (W, H) glyphs and windows
+        glyphs = jnp.swapaxes(glyphs, 1, 2)
+    raster_width, raster_height = xy(*raster.shape[:2], layout)
+    glyph_width, glyph_height = glyphs.shape[1:3]
+    indexed = glyphs.ndim == 3
+    num_glyphs = glyph_ids.shape[0]
+    count = num_glyphs if count is None else jnp.clip(count, 0, num_glyphs)
+
+    # Origins as render_at would compute them (x + i * spacing, truncated to int)
+    origins = (x + jnp.arange(num_glyphs) * spacing).astype(jnp.int32)
+    y = jnp.asarray(y, dtype=jnp.int32)
+
+    # --- Window Extraction ---
+    run_width = int(np.ceil((num_glyphs - 1) * spacing)) + glyph_width
+    window_width = min(run_width, raster_width)
+    window_height = min(glyph_height, raster_height)
+    window_x = jnp.clip(origins[0], 0, raster_width - window_width)
+    window_y = jnp.clip(y, 0, raster_height - window_height)
+    channel_start = (0,) * (raster.ndim - 2)
+    window_start = xy(window_x, window_y, layout) + channel_start
+    window = lax.dynamic_slice(
+        raster, window_start, xy(window_width, window_height, layout) + raster.shape[2:]
+    )
+    window = window if layout == "WHC" else jnp.swapaxes(window, 0, 1)
 
-MAX_LABEL_WIDTH = 100
-MAX_LABEL_HEIGHT = 20
+    columns = window_x + jnp.arange(window_width)
+    glyph_coord_y = window_y + jnp.arange(window_height) - y
+    row_mask = (glyph_coord_y >= 0) & (glyph_coord_y < glyph_height)
+    glyph_coord_y = jnp.clip(glyph_coord_y, 0, glyph_height - 1)
 
+    # Topmost (last) glyph starting at or before each column
+    top_glyph = jnp.minimum(jnp.searchsorted(origins, columns, side="right") - 1, count - 1)
+    num_layers = int(np.ceil(glyph_width / max(int(spacing), 1)))
 
-@jax.jit
-def render_label(raster, x, y, text_digits, char_sprites, spacing=15):
+    if indexed:
+        has_partial_alpha = False
+    else:
+        glyph_alpha = glyphs[..., 3]
+        has_partial_alpha = jnp.any((glyph_alpha > 0) & (glyph_alpha < 255))
+
+    # --- Compositing, from the lowest overlapping glyph to the topmost ---
+    for layer in reversed(range(num_layers)):
+        glyph_index = top_glyph - layer
+        glyph_coord_x = columns - origins[jnp.clip(glyph_index, 0, num_glyphs - 1)]
+        column_mask = (glyph_index >= 0) & (glyph_coord_x >= 0) & (glyph_coord_x < glyph_width)
+        glyph_id = glyph_ids[jnp.clip(glyph_index, 0, num_glyphs - 1)]
+        pixels = glyphs[
+            glyph_id[:, None],
+            jnp.clip(glyph_coord_x, 0, glyph_width - 1)[:, None],
+            glyph_coord_y[None, :],
+        ] # Shape (window_W, window_H[, 4])
+        mask = column_mask[:, None] & row_mask[None, :]
+
+        if indexed:
+            window = jnp.where(mask & (pixels != 0), pixels.astype(raster.dtype), window)
+            continue
+
+        def select_layer(pixels, window, mask=mask):
+            return jnp.where((mask & (pixels[..., 3] > 0))[..., None], pixels[..., :3].astype(raster.dtype), window)
+
+        def blend_layer(pixels, window, mask=mask):
+            alpha = pixels[..., 3:].astype(jnp.float32) / 255.0
+            current = window.astype(jnp.float32)
+            blended = pixels[..., :3].astype(jnp.float32) * alpha + current * (1.0 - alpha)
+            return jnp.where(mask[..., None], blended, current).astype(raster.dtype)
+
+        window = lax.cond(has_partial_alpha, blend_layer, select_layer, pixels, window)
+
+    window = window if layout == "WHC" else jnp.swapaxes(window, 0, 1)
+    return lax.dynamic_update_slice(raster, window, window_start)
+
+
+@partial(jax.jit, static_argnames=["spacing", "layout"])
+def render_label(raster, x, y, text_digits, char_sprites, spacing=15, layout="WHC"):
     """Renders a sequence of digits horizontally starting at (x, y).
 
     Args:
@@ -274,30 +1138,23 @@ def render_label(raster, x, y, text_digits, char_sprites, spacing=15):
         y: Top y coordinate for the text.
         text_digits: 1D JAX array of integer digits to render.
         char_sprites: JAX array of sprites (NumChars, W, H, C).
-        spacing: Horizontal spacing between character origins.
+        spacing: Horizontal spacing between character origins (static).
+        layout: Layout of the raster and sprites, "WHC" or "HWC" (static).
 
     Returns:
         Updated raster.
     """
-    # Assumes char_sprites is (NumChars, W, H, C)
-    sprites = char_sprites[text_digits] # Fetches sprites -> shape (NumDigits, W, H, C)
+    return render_glyph_run(raster, x, y, text_digits, char_sprites, spacing, layout=layout)
 
-    def render_char(i, current_raster):
-        char_x = x + i * spacing # Calculate x position for the i-th character
-        # Render the i-th sprite at (char_x, y)
-        return render_at(current_raster, char_x, y, sprites[i])
 
-    raster = jax.lax.fori_loop(0, sprites.shape[0], render_char, raster)
-    return raster
-
-
-@partial(jax.jit, static_argnames=["spacing", "num_to_render"])
+@partial(jax.jit, static_argnames=["spacing", "layout"])
 def render_label_selective(raster, x, y,
                            all_digits,    # JAX array (e.g., length 2 or more)
                            char_sprites,  # (10, W, H, C)
-                           start_index,   # Concrete integer (0 or 1 usually)
-                           num_to_render, # Concrete integer (1 or 2 usually)
-                           spacing=15):
+                           start_index,   # Integer (0 or 1 usually)
+                           num_to_render, # Integer (1 or 2 usually)
+                           spacing=15,
+                           layout="WHC"):
     """Renders a specified number of digits from a digit array at (x, y).
 
     Args:
@@ -306,27 +1163,22 @@ def render_label_selective(raster, x, y,
         y: Top y coordinate.
         all_digits: JAX array containing all potential digits.
         char_sprites: JAX array of sprite frames for each digit (0-9).
-        start_index: The index within `all_digits` to start rendering from.
-        num_to_render: How many digits to render sequentially from `start_index`.
-        spacing: Horizontal space between digits.
+        start_index: The index within `all_digits` to start rendering from (may be traced).
+        num_to_render: How many digits to render sequentially from `start_index` (may be traced).
+        spacing: Horizontal space between digits (static).
+        layout: Layout of the raster and sprites, "WHC" or "HWC" (static).
 
     Returns:
         Updated raster.
     """
-    def render_char(i, current_raster):
-        # i is the loop index (0 up to num_to_render-1)
-        digit_index_in_array = start_index + i
-        digit_value = all_digits[digit_index_in_array]
-        sprite_to_render = char_sprites[digit_value] # Gets (W, H, C) sprite
-        render_x = x + i * spacing # Calculate x position based on loop index
-        return render_at(current_raster, render_x, y, sprite_to_render)
-
-    raster = jax.lax.fori_loop(0, num_to_render, render_char, raster)
-    return raster
+    num_digits = all_digits.shape[0]
+    digit_indices = jnp.clip(start_index + jnp.arange(num_digits), 0, num_digits - 1)
+    count = jnp.minimum(num_to_render, num_digits - start_index)
+    return render_glyph_run(raster, x, y, all_digits[digit_indices], char_sprites, spacing, count, layout)
 
 
-@jax.jit
-def render_indicator(raster, x, y, value, sprite, spacing=15):
+@partial(jax.jit, static_argnames=["spacing", "layout"])
+def render_indicator(raster, x, y, value, sprite, spacing=15, layout="WHC"):
     """Renders 'value' copies of 'sprite' horizontally starting at (x, y).
 
     Args:
@@ -335,21 +1187,26 @@ def render_indicator(raster, x, y, value, sprite, spacing=15):
         y: Top y coordinate for the indicators.
         value: Number of times to render the sprite.
         sprite: The sprite to render (W, H, C).
-        spacing: Horizontal spacing between sprite origins.
+        spacing: Horizontal spacing between sprite origins (static).
+        layout: Layout of the raster and sprite, "WHC" or "HWC" (static).
 
     Returns:
         Updated raster.
     """
-    # Assumes sprite is (W, H, C)
-    def render_single_indicator(i, current_raster):
-        indicator_x = x + i * spacing # Calculate x for this instance
-        return render_at(current_raster, indicator_x, y, sprite)
-
-    return jax.lax.fori_loop(0, value, render_single_indicator, raster)
+    # Skip copies left of the raster, then enough copies to cross the whole raster,
+    # the rest would not be visible anyway
+    sprite_width = xy(*sprite.shape[:2], layout)[0]
+    raster_width = xy(*raster.shape[:2], layout)[0]
+    first_visible = jnp.maximum(jnp.floor((-x - sprite_width) / spacing).astype(jnp.int32) + 1, 0)
+    max_copies = int(np.ceil((raster_width + sprite_width) / spacing)) + 1
+    return render_glyph_run(
+        raster, x + first_visible * spacing, y, jnp.zeros(max_copies, dtype=jnp.int32), sprite[None], spacing,
+        value - first_visible, layout,
+    )
 
 
-@partial(jax.jit, static_argnames=["width", "height"])
-def render_bar(raster, x, y, value, max_value, width, height, color, default_color):
+@partial(jax.jit, static_argnames=["width", "height", "layout"])
+def render_bar(raster, x, y, value, max_value, width, height, color, default_color, layout="WHC"):
     """Renders a horizontal progress bar at (x, y) with specified geometry.
 
     Args:
@@ -360,20 +1217,20 @@ def render_bar(raster, x, y, value, max_value, width, height, color, default_col
         max_value: Maximum value for the bar.
         width: Geometric width of the bar in pixels.
         height: Geometric height of the bar in pixels.
-        color: RGBA tuple/list/array for the filled portion.
-        default_color: RGBA tuple/list/array for the unfilled portion.
+        color: RGBA tuple/list/array for the filled portion, or a palette index
+               when rendering onto a palette-indexed raster.
+        default_color: RGBA tuple/list/array (or palette index) for the unfilled portion.
+        layout: Layout of the raster, "WHC" or "HWC" (static).
 
     Returns:
         Updated raster.
     """
     color = jnp.asarray(color, dtype=jnp.uint8) # Use uint8 for direct use
     default_color = jnp.asarray(default_color, dtype=jnp.uint8)
-    if color.shape[0] != 4 or default_color.shape[0] != 4:
+    indexed = color.ndim == 0
+    if not indexed and (color.shape[0] != 4 or default_color.shape[0] != 4):
         raise ValueError("Color and default_color must be RGBA")
 
-    # Create the bar shape directly as (Width, Height, 4)
-    bar_shape = (width, height, 4)
-
     # Compute the filled portion width (along axis 0)
     fill_width = jnp.clip(jnp.nan_to_num((value / max_value) * width), 0, width).astype(jnp.int32)
 
@@ -381,9 +1238,11 @@ def render_bar(raster, x, y, value, max_value, width, height, color, default_col
     bar_xx, bar_yy = jnp.meshgrid(jnp.arange(width), jnp.arange(height), indexing='ij')
 
     # Create a mask for the filled portion
-    fill_mask = (bar_xx < fill_width)[..., None] # Shape (W, H, 1)
+    fill_mask = bar_xx < fill_width # Shape (W, H)
+    if not indexed:
+        fill_mask = fill_mask[..., None] # Shape (W, H, 1)
 
-    # Use jnp.where to create the bar content (W, H, 4) directly as uint8
+    # Use jnp.where to create the bar content (W, H, 4) (or (W, H) indices) directly as uint8
     bar_content = jnp.where(
         fill_mask,      # Condition
         color,          # Value if True (broadcasts to (W, H, 4))
@@ -391,7 +1250,9 @@ def render_bar(raster, x, y, value, max_value, width, height, color, default_col
     )
 
     # Render the generated bar (W, H, 4) onto the raster at (x, y)
-    raster = render_at(raster, x, y, bar_content)
+    if layout == "HWC":
+        bar_content = jnp.swapaxes(bar_content, 0, 1)
+    raster = render_at(raster, x, y, bar_content, layout=layout)
 
     return raster
 
@@ -441,25 +1302,14 @@ def int_to_digits(n, max_digits=8):
         A 1D JAX array of length `max_digits`.
     """
     # Ensure n is non-negative
-    n = jnp.maximum(n, 0)
+    n = jnp.maximum(jnp.asarray(n), 0)
     # Clip n to the maximum value representable by max_digits
     max_val = 10**max_digits - 1
     n = jnp.minimum(n, max_val)
 
-    # Use lax.scan to extract digits efficiently
-    def scan_body(carry, _):
-        current_n = carry
-        digit = current_n % 10
-        next_n = current_n // 10
-        # Return next carry and the extracted digit
-        return next_n, digit
-
-    # Initial carry is the number itself
-    # Scan over a dummy array of the correct length
-    _, digits_reversed = lax.scan(scan_body, n, None, length=max_digits)
-
-    # Digits are generated least significant first, flip them
-    return jnp.flip(digits_reversed)
+    # All digits at once: divide by the place values (most significant first)
+    place_values = jnp.asarray([10**i for i in reversed(range(max_digits))], dtype=n.dtype)
+    return (n // place_values) % 10
 
 
 # debug code
@@ -0,0 +1,184 @@
+"""Headless video recording of rendered frames with encoding on a background thread."""
+
+import os
+import queue
+import threading
+from typing import Optional, Sequence
+
+import jax
+import numpy as np
+
+from jaxatari.rendering.atraJaxis import LAYOUTS
+
+
+VIDEO_FORMATS = {"gif": ".gif", "apng": ".png", "raw": ".rgb"}
+
+
+class VideoRecorder:
+    """Writes batches of rendered frames to video files without blocking the caller.
+
+    Frames are handed to a background thread through a bounded queue. The thread pulls
+    them to the host, transposes them from the default atraJaxis layout (W, H, C) unless
+    they are already (H, W, C) (`layout="HWC"`) and encodes one file per environment of
+    the batch. When the queue is full, `add` blocks until the
+    encoder caught up (or drops the batch if `block=False`), so memory stays bounded.
+
+    Formats:
+      - "gif": animated GIF (requires Pillow).
+      - "apng": animated PNG, lossless (requires Pillow).
+      - "raw": uncompressed rgb24 stream, the size is part of the file name, e.g.
+        `ffmpeg -f rawvideo -pix_fmt rgb24 -s 160x210 -r 30 -i video_160x210.rgb video.mp4`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        format: str = "gif",
+        fps: int = 30,
+        max_queue_size: int = 4,
+        layout: str = "WHC",
+    ):
+        """
+        Args:
+            directory: Directory the videos are written to (created if missing).
+            format: One of "gif", "apng" or "raw".
+            fps: Frame rate of the written videos.
+            max_queue_size: Number of batches that may wait for encoding before `add` blocks.
+            layout: Layout of the frames, "WHC" or "HWC" (e.g. from a renderer with `layout="HWC"`).
+        """
+        if format not in VIDEO_FORMATS:
+            raise ValueError(f"Unknown video format {format}, expected one of {tuple(VIDEO_FORMATS)}")
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout}, expected one of {LAYOUTS}")
+        self.directory = directory
+        self.format = format
+        self.fps = fps
+        self.layout = layout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._error = None
+        self._count = 0
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._worker, name="VideoRecorder", daemon=True)
+        self._thread.start()
+
+    def add(
+        self,
+        frames,
+        name: Optional[str] = None,
+        env_indices: Optional[Sequence[int]] = None,
+        block: bool = True,
+    ) -> bool:
+        """Queues a batch of frames for encoding.
+
+        Args:
+            frames: Frames of shape (T, N, W, H, C) (one video per env) or (T, W, H, C),
+                with H and W swapped for the "HWC" layout.
+                JAX arrays are transferred to the host on the encoding thread.
+            name: Base name of the files, defaults to a running counter.
+            env_indices: Only write the videos of these envs of the batch (requires batched frames).
+            block: If False, the batch is dropped instead of waiting when the queue is full.
+
+        Returns:
+            True if the batch was queued, False if it was dropped.
+        """
+        self._raise_worker_error()
+        if self._closed:
+            raise RuntimeError("add called on a closed VideoRecorder")
+        if name is None:
+            name = f"video_{self._count:05d}"
+        self._count += 1
+        if env_indices is not None:
+            if frames.ndim != 5:
+                raise ValueError(
+                    f"env_indices needs a batch of videos (T, N, W, H, C), got frames of shape {frames.shape}"
+                )
+            env_indices = list(env_indices)
+            frames = frames[:, np.asarray(env_indices)]
+        if isinstance(frames, jax.Array):
+            # start the device to host copy now, the encoder waits for it
+            frames.copy_to_host_async()
+        try:
+            self._queue.put((frames, name, env_indices), block=block)
+        except queue.Full:
+            return False
+        return True
+
+    def flush(self):
+        """Waits until all queued batches are written."""
+        self._queue.join()
+        self._raise_worker_error()
+
+    def close(self):
+        """Writes the remaining batches and stops the encoding thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_worker_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _raise_worker_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Encoding a video failed") from error
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    self._write_batch(*item)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write_batch(self, frames, name, env_indices):
+        frames = np.asarray(frames)
+        if frames.ndim == 4:
+            self._write_video(frames, name)
+            return
+        if frames.ndim != 5:
+            raise ValueError(f"Expected frames of shape (T, N, W, H, C) or (T, W, H, C), got {frames.shape}")
+        if env_indices is None:
+            env_indices = range(frames.shape[1])
+        for position, env in enumerate(env_indices):
+            self._write_video(frames[:, position], f"{name}_env{env}")
+
+    def _write_video(self, frames, name):
+        # (T, W, H, C) -> (T, H, W, C), alpha is dropped and a single channel is kept as gray
+        if self.layout == "WHC":
+            frames = frames.transpose(0, 2, 1, 3)
+        frames = frames[..., :3]
+        if frames.shape[-1] == 1:
+            frames = frames[..., 0]
+        frames = np.ascontiguousarray(frames, dtype=np.uint8)
+        height, width = frames.shape[1:3]
+        extension = VIDEO_FORMATS[self.format]
+
+        if self.format == "raw":
+            if frames.ndim == 3:
+                frames = np.repeat(frames[..., None], 3, axis=-1)
+            path = os.path.join(self.directory, f"{name}_{width}x{height}{extension}")
+            frames.tofile(path)
+            return
+
+        from PIL import Image
+
+        images = [Image.fromarray(frame) for frame in frames]
+        images[0].save(
+            os.path.join(self.directory, name + extension),
+            format="GIF" if self.format == "gif" else "PNG",
+            save_all=True,
+            append_images=images[1:],
+            duration=1000 / self.fps,
+            loop=0,
+        )
@@ -0,0 +1,157 @@
+"""Gymnasium vector env adapter for JAXAtari environments."""
+
+from typing import Any, Dict, Optional, Tuple
+
+import chex
+import gymnasium
+import jax
+import jax.numpy as jnp
+import numpy as np
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from jaxatari.wrappers import AtariWrapper
+
+
+OUTPUT_MODES = ("dlpack", "torch", "numpy")
+
+
+def _resets_itself(env) -> bool:
+    """Whether the wrapper stack contains an `AtariWrapper`, which resets its env within `step`."""
+    while env is not None:
+        if isinstance(env, AtariWrapper):
+            return True
+        env = getattr(env, "_env", None)
+    return False
+
+
+class JaxAtariVectorEnv(VectorEnv):
+    """Exposes a batch of JAXAtari environments through the `gymnasium.vector.VectorEnv` interface.
+
+    The wrapped env has to follow the gymnax API of the wrappers (`reset(key)` and
+    `step(key, state, action)`) and return array observations, i.e. at least a
+    `FlattenObservationWrapper` or an `AtariWrapper` with a renderer has to be applied.
+    Stepping and auto-resetting all envs happens in a single jitted call on device.
+
+    The auto-reset of the adapter replaces the state of the whole stack with `env.reset`, including
+    the state of stateful wrappers (e.g. `EpisodeStatsWrapper`, `LogWrapper` or the statistics of
+    `NormalizeObservationWrapper`). It is therefore disabled by default for stacks containing an
+    `AtariWrapper`, which already resets the wrapped env in `step`; stateful wrappers should be
+    applied on top of it.
+
+    Output modes:
+      - "dlpack": observations, rewards, dones and infos are returned as JAX arrays. They implement
+        the DLPack protocol, so `torch.from_dlpack(obs)` shares the buffer without a copy.
+      - "torch": same as "dlpack", but the conversion to torch tensors is already done.
+      - "numpy": numpy views of the buffers (zero-copy on the CPU backend, one transfer otherwise).
+    """
+
+    metadata = {"autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(
+        self,
+        env,
+        num_envs: int,
+        output_mode: str = "dlpack",
+        autoreset: Optional[bool] = None,
+        seed: int = 0,
+        axis_name: Optional[str] = None,
+    ):
+        """
+        Args:
+            env: The (wrapped) JAXAtari environment.
+            num_envs: Number of environments to run in parallel.
+            output_mode: One of "dlpack", "torch" or "numpy".
+            autoreset: If True, finished envs are reset on device in the same step and the last
+                observation of the episode is reported as `final_obs` in the infos. Defaults to True
+                unless the stack resets itself (contains an `AtariWrapper`).
+            seed: Seed for the PRNG key used until `reset` is called with a new seed.
+            axis_name: Name of the env batch axis, for wrappers with collectives over the batch,
+                e.g. `NormalizeObservationWrapper(axis_name=...)`.
+        """
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode {output_mode}, expected one of {OUTPUT_MODES}")
+        self.env = env
+        self.num_envs = num_envs
+        self.output_mode = output_mode
+        self.axis_name = axis_name
+        self.autoreset = not _resets_itself(env) if autoreset is None else autoreset
+        self.metadata = {
+            **self.metadata,
+            "autoreset_mode": AutoresetMode.SAME_STEP if self.autoreset else AutoresetMode.DISABLED,
+        }
+        self._key = jax.random.PRNGKey(seed)
+        self._state = None
+
+        # traced with the batch axis, wrappers may use collectives over it
+        batch_obs_shape = jax.eval_shape(
+            jax.vmap(env.reset, axis_name=axis_name), jax.random.split(jax.random.PRNGKey(0), 1)
+        )[0]
+        obs_shape = jax.ShapeDtypeStruct(batch_obs_shape.shape[1:], batch_obs_shape.dtype)
+        env_obs_space = env.observation_space()
+        self.single_observation_space = gymnasium.spaces.Box(
+            low=np.broadcast_to(np.asarray(env_obs_space.low, dtype=obs_shape.dtype), obs_shape.shape),
+            high=np.broadcast_to(np.asarray(env_obs_space.high, dtype=obs_shape.dtype), obs_shape.shape),
+            shape=obs_shape.shape,
+            dtype=obs_shape.dtype,
+        )
+        self.single_action_space = gymnasium.spaces.Discrete(env.action_space().n)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        self._reset_fn = jax.jit(jax.vmap(env.reset, axis_name=axis_name))
+        self._step_fn = jax.jit(jax.vmap(self._step_and_reset, axis_name=axis_name))
+
+    def _step_and_reset(
+        self, key: chex.PRNGKey, state: Any, action: chex.Array
+    ) -> Tuple[chex.Array, Any, chex.Array, chex.Array, Dict[str, Any]]:
+        step_key, reset_key = jax.random.split(key)
+        obs, state, reward, done, info = self.env.step(step_key, state, action)
+        info = dict(info)
+        if self.autoreset:
+            reset_obs, reset_state = self.env.reset(reset_key)
+            state = jax.tree.map(lambda r, s: jnp.where(done, r, s), reset_state, state)
+            info["final_obs"] = obs
+            obs = jnp.where(done, reset_obs, obs)
+        return obs, state, reward, done, info
+
+    def _export(self, x: chex.Array):
+        if self.output_mode == "numpy":
+            return np.asarray(x)
+        if self.output_mode == "torch":
+            import torch
+
+            return torch.from_dlpack(x)
+        return x
+
+    def _import_actions(self, actions) -> chex.Array:
+        # torch tensors (and other DLPack producers) are imported without a copy
+        if not isinstance(actions, (jax.Array, np.ndarray)) and hasattr(actions, "__dlpack__"):
+            return jax.dlpack.from_dlpack(actions)
+        return jnp.asarray(actions)
+
+    def reset(
+        self, *, seed: Optional[int] = None, options: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Any, Dict[str, Any]]:
+        if seed is not None:
+            self._key = jax.random.PRNGKey(seed)
+        self._key, reset_key = jax.random.split(self._key)
+        obs, self._state = self._reset_fn(jax.random.split(reset_key, self.num_envs))
+        return self._export(obs), {}
+
+    def step(self, actions) -> Tuple[Any, Any, Any, Any, Dict[str, Any]]:
+        if self._state is None:
+            raise RuntimeError("reset has to be called before step")
+        self._key, step_key = jax.random.split(self._key)
+        obs, self._state, reward, done, info = self._step_fn(
+            jax.random.split(step_key, self.num_envs), self._state, self._import_actions(actions)
+        )
+        # the JAXAtari envs do not distinguish truncation from termination
+        truncated = jnp.zeros_like(done)
+        return (
+            self._export(obs),
+            self._export(reward),
+            self._export(done),
+            self._export(truncated),
+            jax.tree.map(self._export, info),
+        )
@@ -1,19 +1,50 @@
 """Wrappers for pure RL."""
 
 import functools
-from typing import Any, Dict, Tuple, Union
+import hashlib
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Tuple, Union
 
 
 import chex
+import numpy as np
 from flax import struct
 import jax
 import jax.numpy as jnp
 from jaxatari.environment import EnvState
+import jaxatari.rendering.atraJaxis as aj
 from gymnax.environments import spaces
 
 
+def _hashable(value: Any) -> Hashable:
+    """Converts a (possibly nested) configuration value into a hashable description."""
+    if isinstance(value, GymnaxWrapper):
+        return value.spec
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, (tuple, list)):
+        return (type(value), tuple(_hashable(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted(((k, _hashable(v)) for k, v in value.items()), key=lambda kv: str(kv[0])))
+    if isinstance(value, (np.ndarray, jax.Array)):
+        value = np.asarray(value)
+        return ("array", value.shape, str(value.dtype), hashlib.sha1(value.tobytes()).hexdigest())
+    if type(value).__hash__ in (object.__hash__, None) and hasattr(value, "__dict__") and not callable(value):
+        # plain objects (environments, renderers) are described by their attributes
+        return (type(value), _hashable(vars(value)))
+    # functions, types and other hashable values are compared by their own hash
+    return value
+
+
 class GymnaxWrapper(object):
-    """Base class for Gymnax wrappers."""
+    """Base class for Gymnax wrappers.
+
+    Wrappers are hashed and compared by `spec`, a description of the whole wrapper chain and its
+    configuration. Since `reset` and `step` are jitted with the wrapper as static argument, identical
+    stacks therefore share their compiled functions even if they are different instances.
+    The configuration of a wrapper must not be changed after construction.
+    """
 
     def __init__(self, env):
         self._env = env
@@ -22,6 +53,47 @@ class GymnaxWrapper(object):
     def __getattr__(self, name):
         return getattr(self._env, name)
 
+    @functools.cached_property
+    def spec(self) -> Hashable:
+        config = {k: v for k, v in vars(self).items() if k != "spec"}
+        return (type(self), _hashable(config))
+
+    def __hash__(self):
+        return hash(self.spec)
+
+    def __eq__(self, other):
+        return isinstance(other, GymnaxWrapper) and self.spec == other.spec
+
+
+class CompiledWrapperChain(NamedTuple):
+    reset: Callable
+    step: Callable
+
+
+_COMPILED_CHAINS: Dict[Hashable, CompiledWrapperChain] = {}
+
+
+def compile_wrapper_chain(env: GymnaxWrapper) -> CompiledWrapperChain:
+    """Compiles a wrapper stack into a single jitted reset and step function.
+
+    The functions are cached by the `spec` of the stack, so identical stacks share them. Since identical
+    stacks also lower to identical HLO, they can be shared across processes by enabling JAX's persistent
+    compilation cache (`jax.config.update("jax_compilation_cache_dir", ...)`).
+
+    Args:
+      env: The outermost wrapper of the stack.
+
+    Returns:
+      A CompiledWrapperChain with `reset(key)` and `step(key, state, action)`.
+    """
+    spec = env.spec
+    if spec not in _COMPILED_CHAINS:
+        _COMPILED_CHAINS[spec] = CompiledWrapperChain(
+            reset=jax.jit(lambda key: env.reset(key)),
+            step=jax.jit(lambda key, state, action: env.step(key, state, action)),
+        )
+    return _COMPILED_CHAINS[spec]
+
 
 class FlattenObservationWrapper(GymnaxWrapper):
     """Transform the observations of the environment into jnp arrays and flatten.
@@ -67,75 +139,515 @@ class FlattenObservationWrapper(GymnaxWrapper):
         info = info._asdict()
         return obs, state, reward, done, info
 
+class OccupancyGridWrapper(GymnaxWrapper):
+    """Rasterize the object-centric observations into a low-resolution occupancy grid.
+
+    Each entity class reported by the env's `obs_to_entity_boxes` gets one channel per stacked
+    frame, so observations have shape (grid_width, grid_height, frame_stack_size * num_classes)
+    with the classes of each frame next to each other, sorted by class name. A cell is 1 if it overlaps an active entity.
+    The boxes are written with scatter-adds into a 2D difference array followed by two cumulative
+    sums, which is far cheaper than rendering sprites.
+    Like `FlattenObservationWrapper`, this wrapper has to be applied first.
+    """
+
+    def __init__(self, env, grid_shape: Tuple[int, int] = (40, 52), screen_shape: Tuple[int, int] = (160, 210)):
+        super().__init__(env)
+        self.grid_shape = tuple(grid_shape)
+        self.screen_shape = tuple(screen_shape)
+
+    def observation_space(self) -> spaces.Box:
+        obs_shape = jax.eval_shape(self.reset, jax.random.PRNGKey(0))[0].shape
+        return spaces.Box(low=0, high=1, shape=obs_shape, dtype=jnp.uint8)
+
+    def _rasterize_boxes(self, boxes: chex.Array) -> chex.Array:
+        """Rasterizes (N, 5) boxes (x, y, width, height, active) into a (grid_width, grid_height) grid."""
+        grid_width, grid_height = self.grid_shape
+        scale = jnp.array(self.grid_shape, dtype=jnp.float32) / jnp.array(self.screen_shape, dtype=jnp.float32)
+        boxes = boxes.astype(jnp.float32)
+        start = jnp.floor(boxes[:, :2] * scale).astype(jnp.int32)
+        end = jnp.ceil((boxes[:, :2] + boxes[:, 2:4]) * scale).astype(jnp.int32)
+        start = jnp.clip(start, 0, jnp.array(self.grid_shape))
+        end = jnp.clip(end, 0, jnp.array(self.grid_shape))
+        active = (boxes[:, 4] != 0) & jnp.all(end > start, axis=-1)
+        weight = active.astype(jnp.int32)
+
+        # mark the corners of every box, the cumulative sums fill the enclosed cells
+        diff = jnp.zeros((grid_width + 1, grid_height + 1), dtype=jnp.int32)
+        diff = diff.at[start[:, 0], start[:, 1]].add(weight)
+        diff = diff.at[end[:, 0], start[:, 1]].add(-weight)
+        diff = diff.at[start[:, 0], end[:, 1]].add(-weight)
+        diff = diff.at[end[:, 0], end[:, 1]].add(weight)
+        counts = jnp.cumsum(jnp.cumsum(diff, axis=0), axis=1)
+        return (counts[:grid_width, :grid_height] > 0).astype(jnp.uint8)
+
+    def _obs_to_grid(self, obs) -> chex.Array:
+        def frame_to_grid(frame_obs):
+            entity_boxes = self._env.obs_to_entity_boxes(frame_obs)
+            return jnp.stack([self._rasterize_boxes(entity_boxes[name]) for name in sorted(entity_boxes)], axis=-1)
+
+        if getattr(self._env, "frame_stack_size", None) is None:
+            return frame_to_grid(obs)
+        grids = jax.vmap(frame_to_grid)(obs)  # (frames, W, H, classes)
+        return jnp.moveaxis(grids, 0, 2).reshape(self.grid_shape + (-1,))
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def reset(
+        self, key: chex.PRNGKey
+    ) -> Tuple[chex.Array, EnvState]:
+        obs, state = self._env.reset()
+        return self._obs_to_grid(obs), state
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def step(
+        self,
+        key: chex.PRNGKey,
+        state: EnvState,
+        action: Union[int, float],
+    ) -> Tuple[chex.Array, EnvState, float, bool, Any]:
+        obs, state, reward, done, info = self._env.step(state, action)
+        info = info._asdict()
+        return self._obs_to_grid(obs), state, reward, done, info
+
+
 @struct.dataclass 
 class AtariState:
     env_state: EnvState 
     step: int
     prev_action: int
+    sticky_action_prob: float
+    frame_skip: int
+    max_episode_length: int
     
 class AtariWrapper(GymnaxWrapper):
-    def __init__(self, env, sticky_actions: bool = True, frame_skip: int = 4, max_episode_length: int = 10_000):
+    """Frame skipping, sticky actions and episode truncation as in the ALE.
+
+    If a renderer is passed, observations are replaced by pixel frames: the
+    last two frames of every frame-skip block are max-pooled (to remove sprite
+    flickering) and downsampled to `pixel_shape` (width, height) in a single fused
+    step. Only those two frames are rendered per agent step, independent of
+    `frame_skip`. The renderer has to accept the state of the wrapped environment.
+    Observations keep the raster layout of the renderer, i.e. they are (width, height)
+    frames for the default "WHC" layout and (height, width) frames for "HWC".
+
+    The sticky action probability, frame skip and maximum episode length are kept
+    in the state, so they can be varied per env (see `set_params`) without
+    recompiling. Frame skipping is a masked scan over `max_frame_skip` frames,
+    which defaults to `frame_skip`.
+    """
+
+    def __init__(
+        self,
+        env,
+        sticky_actions: bool = True,
+        frame_skip: int = 4,
+        max_episode_length: int = 10_000,
+        renderer=None,
+        pixel_shape: Tuple[int, int] = (84, 84),
+        grayscale: bool = True,
+        max_frame_skip: Union[int, None] = None,
+    ):
         super().__init__(env)
         self.sticky_actions = sticky_actions
         self.frame_skip = frame_skip
+        self.max_frame_skip = frame_skip if max_frame_skip is None else max_frame_skip
+        if self.frame_skip > self.max_frame_skip:
+            raise ValueError(f"frame_skip {frame_skip} exceeds max_frame_skip {max_frame_skip}")
         self.max_episode_length = max_episode_length
+        self.renderer = renderer
+        self.pixel_shape = tuple(pixel_shape)
+        self.grayscale = grayscale
 
-    @functools.partial(jax.jit, static_argnums=(0,))
-    def reset(self, key: chex.PRNGKey) -> Tuple[chex.Array, EnvState]:
+    @property
+    def _frame_shape(self) -> Tuple[int, int]:
+        """`pixel_shape` ordered like the raster axes of the renderer."""
+        return aj.xy(*self.pixel_shape, getattr(self.renderer, "layout", "WHC"))
+
+    def observation_space(self) -> spaces.Box:
+        if self.renderer is None:
+            return self._env.observation_space()
+        shape = self._frame_shape if self.grayscale else self._frame_shape + (3,)
+        return spaces.Box(low=0, high=255, shape=shape, dtype=jnp.uint8)
+
+    def _pool_and_downsample(self, prev_frame: chex.Array, frame: chex.Array) -> chex.Array:
+        """Max-pools two rasters of the renderer and resizes the result to `pixel_shape`.
+
+        Renderers that already render at `pixel_shape` (e.g. `SeaquestRenderer(resolution=(84, 84))`)
+        skip the resize. Frames of indexed renderers are looked up in the palette first,
+        since palette indices cannot be pooled.
+        """
+        if getattr(self.renderer, "indexed", False):
+            prev_frame, frame = (self.renderer.convert(f, color="rgb") for f in (prev_frame, frame))
+        pooled = jnp.maximum(prev_frame, frame)[..., :3].astype(jnp.float32)
+        if self.grayscale:
+            pooled = pooled @ jnp.array([0.299, 0.587, 0.114], dtype=jnp.float32)
+        if pooled.shape[:2] != self._frame_shape:
+            pooled = jax.image.resize(pooled, self._frame_shape + pooled.shape[2:], method="bilinear")
+        return jnp.clip(jnp.round(pooled), 0, 255).astype(jnp.uint8)
+
+    def set_params(
+        self,
+        state: AtariState,
+        sticky_action_prob: Union[float, chex.Array, None] = None,
+        frame_skip: Union[int, chex.Array, None] = None,
+        max_episode_length: Union[int, chex.Array, None] = None,
+    ) -> AtariState:
+        """Overrides the per-env parameters in a (possibly batched) state.
+
+        Scalars are broadcast to all envs, arrays have to match the batch shape of the state.
+        Frame skips are clipped to [1, max_frame_skip] in `step`.
+        """
+        params = {
+            "sticky_action_prob": sticky_action_prob,
+            "frame_skip": frame_skip,
+            "max_episode_length": max_episode_length,
+        }
+        return state.replace(**{
+            name: jnp.broadcast_to(jnp.asarray(value, dtype=getattr(state, name).dtype), getattr(state, name).shape)
+            for name, value in params.items() if value is not None
+        })
+
+    def _reset(self, key: chex.PRNGKey) -> Tuple[chex.Array, AtariState]:
         obs, env_state = self._env.reset(key)
         step = jnp.array(0)
         prev_action = jnp.array(0)
-        return obs, AtariState(env_state, step, prev_action)
+        # With probability 0.25, the previous action is repeated
+        sticky_action_prob = jnp.array(0.25 if self.sticky_actions else 0.0)
+        frame_skip = jnp.array(self.frame_skip)
+        max_episode_length = jnp.array(self.max_episode_length)
+        return obs, AtariState(env_state, step, prev_action, sticky_action_prob, frame_skip, max_episode_length)
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def reset(self, key: chex.PRNGKey) -> Tuple[chex.Array, EnvState]:
+        obs, state = self._reset(key)
+        if self.renderer is not None:
+            frame = self.renderer.render(state.env_state)
+            obs = self._pool_and_downsample(frame, frame)
+        return obs, state
 
     @functools.partial(jax.jit, static_argnums=(0,))
     def step(self, key: chex.PRNGKey, state: AtariState, action: Union[int, float]) -> Tuple[chex.Array, EnvState, float, bool, Dict[Any, Any]]:
-        new_action = action
-        if self.sticky_actions:
-            # With probability 0.25, we repeat the previous action
-            key, repeat_key = jax.random.split(key)
-            repeat_prev_action_mask = jax.random.uniform(repeat_key, shape=action.shape) < 0.25
-            new_action = jnp.where(repeat_prev_action_mask, state.prev_action, action)
-
-        # use scan to step the env for frame_skip times
-        def body_fn(carry, _):
-            env_state, action = carry
+        key, repeat_key = jax.random.split(key)
+        repeat_prev_action_mask = jax.random.uniform(repeat_key, shape=action.shape) < state.sticky_action_prob
+        new_action = jnp.where(repeat_prev_action_mask, state.prev_action, action)
+        frame_skip = jnp.clip(state.frame_skip, 1, self.max_frame_skip)
+
+        # use a scan over max_frame_skip frames to step the env for frame_skip times, later frames are masked out
+        # the previous env state is carried along so that the last two frames can be rendered after the scan
+        def body_fn(carry, i):
+            prev_env_state, env_state, action = carry
             obs, new_env_state, reward, done, info = self._env.step(key, env_state, action) 
-            return (new_env_state, action), (obs, reward, done, info)
-
-        (new_env_state, new_action), (obs, rewards, dones, infos) = jax.lax.scan(
+            active = i < frame_skip
+            prev_env_state, new_env_state = jax.tree.map(
+                lambda new, old: jnp.where(active, new, old),
+                (env_state, new_env_state),
+                (prev_env_state, env_state),
+            )
+            return (prev_env_state, new_env_state, action), (obs, reward * active, done & active, info)
+
+        (prev_env_state, new_env_state, new_action), (obs, rewards, dones, infos) = jax.lax.scan(
             body_fn,
-            (state.env_state, new_action),
-            None,
-            length=self.frame_skip,
+            (state.env_state, state.env_state, new_action),
+            jnp.arange(self.max_frame_skip),
         )
-        new_obs = obs[-1]
+        last = frame_skip - 1
+        new_obs = obs[last]
         reward = jnp.sum(rewards)
 
-        done = jnp.logical_or(dones.any(), state.step >= self.max_episode_length)
+        done = jnp.logical_or(dones.any(), state.step >= state.max_episode_length)
 
         def reduce_info(k, v):
             if k == "all_rewards":
-                return v.sum(axis=0)
+                active = jnp.arange(self.max_frame_skip) < frame_skip
+                return jnp.where(active.reshape((-1,) + (1,) * (v.ndim - 1)), v, 0).sum(axis=0)
             else:
-                return v[-1]
+                return v[last]
 
         info = {
             k: reduce_info(k, v) for k, v in infos.items()
         }
 
-        new_state = AtariState(new_env_state, state.step + 1, new_action)
+        new_state = state.replace(env_state=new_env_state, step=state.step + 1, prev_action=new_action)
 
-        # Reset the environment if done
+        # Reset the environment if done, the per-env parameters are kept
         new_obs, new_state = jax.lax.cond(
             done,
-            lambda _: self.reset(key),
+            lambda _: self._reset(key),
             lambda _: (new_obs, new_state),
             operand=None
         )
+        new_state = new_state.replace(
+            sticky_action_prob=state.sticky_action_prob,
+            frame_skip=state.frame_skip,
+            max_episode_length=state.max_episode_length,
+        )
+
+        if self.renderer is not None:
+            # after a reset there is no previous frame, so the new first frame is pooled with itself
+            frame = self.renderer.render(new_state.env_state)
+            prev_frame = jnp.where(done, frame, self.renderer.render(prev_env_state))
+            new_obs = self._pool_and_downsample(prev_frame, frame)
 
         return new_obs, new_state, reward, done, info
         
 
+class StartStateBankWrapper(GymnaxWrapper):
+    """Reset into a random entry of a precomputed bank of start states.
+
+    By default the bank is built once at construction by applying a random number of no-op
+    actions (uniform in [0, max_noops]) to the initial state, as in the standard Atari evaluation
+    protocol. Alternatively a bank of (observations, states) stacked along a leading axis can be
+    passed, e.g. sampled from recorded play. A reset then only costs a gather.
+    Apply this wrapper below `AtariWrapper`, so that the no-ops are single frames and auto-resets
+    are randomized as well.
+    """
+
+    def __init__(
+        self,
+        env,
+        bank_size: int = 64,
+        max_noops: int = 30,
+        noop_action: int = 0,
+        seed: int = 0,
+        bank: Union[Tuple[chex.Array, EnvState], None] = None,
+    ):
+        super().__init__(env)
+        self.noop_action = noop_action
+        self.max_noops = max_noops
+        if bank is None:
+            bank = self._build_noop_bank(jax.random.PRNGKey(seed), bank_size)
+        self.bank = bank
+        self.bank_size = jax.tree.leaves(bank)[0].shape[0]
+
+    def _build_noop_bank(self, key: chex.PRNGKey, bank_size: int) -> Tuple[chex.Array, EnvState]:
+        def build_entry(key):
+            reset_key, noop_key, step_key = jax.random.split(key, 3)
+            num_noops = jax.random.randint(noop_key, (), 0, self.max_noops + 1)
+            obs, state = self._env.reset(reset_key)
+
+            def body_fn(carry, i):
+                obs, state = carry
+                new_obs, new_state, _, _, _ = self._env.step(
+                    jax.random.fold_in(step_key, i), state, jnp.array(self.noop_action)
+                )
+                # only the first num_noops steps are applied
+                return jax.tree.map(lambda new, old: jnp.where(i < num_noops, new, old), (new_obs, new_state), (obs, state)), None
+
+            (obs, state), _ = jax.lax.scan(body_fn, (obs, state), jnp.arange(self.max_noops))
+            return obs, state
+
+        return jax.jit(jax.vmap(build_entry))(jax.random.split(key, bank_size))
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def reset(
+        self, key: chex.PRNGKey
+    ) -> Tuple[chex.Array, EnvState]:
+        idx = jax.random.randint(key, (), 0, self.bank_size)
+        obs, state = jax.tree.map(lambda x: x[idx], self.bank)
+        return obs, state
+
+
+@struct.dataclass
+class NormalizeObservationState:
+    env_state: EnvState
+    mean: chex.Array
+    var: chex.Array
+    count: chex.Array
+    frozen: chex.Array
+
+
+class NormalizeObservationWrapper(GymnaxWrapper):
+    """Normalize observations with a running mean and variance kept on device.
+
+    The statistics are updated with every observation (Welford/Chan update) unless they are
+    frozen in the state, see `freeze`. The normalized observations are float32 and clipped to
+    [-clip, clip]. If `axis_name` is given, the wrapper has to be vmapped with the same axis name
+    and all envs of the batch share one set of statistics, updated with the batch mean and variance
+    (`JaxAtariVectorEnv` takes the same `axis_name`). Otherwise each env keeps its own statistics.
+    Apply this wrapper on top of `AtariWrapper`: below it, every auto-reset calls `reset` and
+    re-initializes the statistics.
+    """
+
+    def __init__(self, env, clip: float = 10.0, epsilon: float = 1e-8, axis_name: Union[str, None] = None):
+        super().__init__(env)
+        self.clip = clip
+        self.epsilon = epsilon
+        self.axis_name = axis_name
+
+    def observation_space(self) -> spaces.Box:
+        return spaces.Box(
+            low=-self.clip,
+            high=self.clip,
+            shape=self._env.observation_space().shape,
+            dtype=jnp.float32,
+        )
+
+    def _update(self, state: NormalizeObservationState, obs: chex.Array) -> NormalizeObservationState:
+        obs = obs.astype(jnp.float32)
+        if self.axis_name is None:
+            batch_mean, batch_var, batch_count = obs, jnp.zeros_like(obs), 1.0
+        else:
+            batch_mean = jax.lax.pmean(obs, self.axis_name)
+            batch_var = jax.lax.pmean((obs - batch_mean) ** 2, self.axis_name)
+            batch_count = jax.lax.psum(1.0, self.axis_name)
+
+        delta = batch_mean - state.mean
+        total_count = state.count + batch_count
+        mean = state.mean + delta * batch_count / total_count
+        m2 = state.var * state.count + batch_var * batch_count + delta**2 * state.count * batch_count / total_count
+        var = m2 / total_count
+
+        return state.replace(
+            mean=jnp.where(state.frozen, state.mean, mean),
+            var=jnp.where(state.frozen, state.var, var),
+            count=jnp.where(state.frozen, state.count, total_count),
+        )
+
+    def _normalize(self, state: NormalizeObservationState, obs: chex.Array) -> chex.Array:
+        normalized = (obs.astype(jnp.float32) - state.mean) / jnp.sqrt(state.var + self.epsilon)
+        return jnp.clip(normalized, -self.clip, self.clip)
+
+    def freeze(self, state: NormalizeObservationState, frozen: bool = True) -> NormalizeObservationState:
+        """Stops (or resumes) updating the statistics, e.g. for evaluation. Does not require recompilation."""
+        return state.replace(frozen=jnp.full_like(state.frozen, frozen))
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def reset(
+        self, key: chex.PRNGKey
+    ) -> Tuple[chex.Array, NormalizeObservationState]:
+        obs, env_state = self._env.reset(key)
+        state = NormalizeObservationState(
+            env_state=env_state,
+            mean=jnp.zeros(obs.shape, dtype=jnp.float32),
+            var=jnp.ones(obs.shape, dtype=jnp.float32),
+            # small initial count to avoid dividing by zero in the first update
+            count=jnp.array(1e-4, dtype=jnp.float32),
+            frozen=jnp.array(False),
+        )
+        state = self._update(state, obs)
+        return self._normalize(state, obs), state
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def step(
+        self,
+        key: chex.PRNGKey,
+        state: NormalizeObservationState,
+        action: Union[int, float],
+    ) -> Tuple[chex.Array, NormalizeObservationState, jnp.ndarray, bool, Dict[Any, Any]]:
+        obs, env_state, reward, done, info = self._env.step(
+            key, state.env_state, action
+        )
+        state = self._update(state.replace(env_state=env_state), obs)
+        return self._normalize(state, obs), state, reward, done, info
+
+
+class DeltaObservation(NamedTuple):
+    """Observation encoded relative to the previous one.
+
+    `mask` is the bit-packed (np.packbits order) change mask over the flat observation and `values` holds
+    the changed values in order, padded with zeros after the first `num_changed` entries. For transport
+    only `mask` and `values[:num_changed]` have to be sent. On keyframes all entries are marked as changed.
+    """
+    keyframe: chex.Array
+    num_changed: chex.Array
+    mask: chex.Array
+    values: chex.Array
+
+
+@struct.dataclass
+class DeltaEncodeState:
+    env_state: EnvState
+    last_obs: chex.Array
+    steps_since_keyframe: int
+
+
+def decode_delta_observation(prev_obs: chex.Array, delta: DeltaObservation) -> chex.Array:
+    """Reconstructs the full flat observation from the previous one and a DeltaObservation. Jittable and vmappable."""
+    size = prev_obs.shape[-1]
+    mask = jnp.unpackbits(delta.mask, count=size).astype(jnp.bool_)
+    idx = jnp.nonzero(mask, size=size, fill_value=size)[0]
+    return prev_obs.at[idx].set(delta.values, mode="drop")
+
+
+class DeltaDecoder:
+    """Host-side decoder for a stream of (possibly batched) DeltaObservations.
+
+    Accepts untrimmed values as well as values trimmed to `num_changed`.
+    """
+
+    def __init__(self):
+        self.obs = None
+
+    def decode(self, delta: DeltaObservation) -> np.ndarray:
+        keyframe = np.asarray(delta.keyframe)
+        packed_mask = np.asarray(delta.mask)
+        values = np.asarray(delta.values)
+        batch_shape = keyframe.shape
+        if self.obs is None:
+            if not keyframe.all():
+                raise ValueError("The first decoded observation has to be a keyframe")
+            self.obs = np.zeros(batch_shape + (values.shape[-1],), dtype=values.dtype)
+        obs = self.obs.reshape(-1, self.obs.shape[-1])
+        packed_mask = packed_mask.reshape(-1, packed_mask.shape[-1])
+        values = values.reshape(-1, values.shape[-1])
+        num_changed = np.asarray(delta.num_changed).reshape(-1)
+        for i in range(obs.shape[0]):
+            mask = np.unpackbits(packed_mask[i], count=obs.shape[-1]).astype(bool)
+            obs[i, mask] = values[i, :num_changed[i]]
+        self.obs = obs.reshape(self.obs.shape)
+        return self.obs.copy()
+
+
+class DeltaEncodeWrapper(GymnaxWrapper):
+    """Encode flat observations as changes relative to the previous step.
+
+    Most entity fields are unchanged from one step to the next, so the change mask plus the
+    changed values are much smaller than the full observation. A keyframe with all values is
+    emitted on reset and every `keyframe_interval` steps, so that decoders can (re)synchronize.
+    Decode with `decode_delta_observation` on device or `DeltaDecoder` on the host.
+    Has to be applied on top of a wrapper producing flat observations, e.g. FlattenObservationWrapper.
+    """
+
+    def __init__(self, env, keyframe_interval: int = 100):
+        super().__init__(env)
+        self.keyframe_interval = keyframe_interval
+
+    def _encode(self, obs: chex.Array, last_obs: chex.Array, keyframe: chex.Array) -> DeltaObservation:
+        size = obs.shape[-1]
+        changed = jnp.logical_or(obs != last_obs, keyframe)
+        idx = jnp.nonzero(changed, size=size, fill_value=0)[0]
+        num_changed = jnp.sum(changed, dtype=jnp.int32)
+        values = jnp.where(jnp.arange(size) < num_changed, obs[idx], jnp.zeros_like(obs))
+        return DeltaObservation(keyframe, num_changed, jnp.packbits(changed), values)
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def reset(
+        self, key: chex.PRNGKey
+    ) -> Tuple[DeltaObservation, DeltaEncodeState]:
+        obs, env_state = self._env.reset(key)
+        delta = self._encode(obs, obs, jnp.array(True))
+        return delta, DeltaEncodeState(env_state, obs, jnp.array(0))
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def step(
+        self,
+        key: chex.PRNGKey,
+        state: DeltaEncodeState,
+        action: Union[int, float],
+    ) -> Tuple[DeltaObservation, DeltaEncodeState, jnp.ndarray, bool, Dict[Any, Any]]:
+        obs, env_state, reward, done, info = self._env.step(
+            key, state.env_state, action
+        )
+        steps_since_keyframe = state.steps_since_keyframe + 1
+        keyframe = steps_since_keyframe >= self.keyframe_interval
+        delta = self._encode(obs, state.last_obs, keyframe)
+        state = DeltaEncodeState(
+            env_state=env_state,
+            last_obs=obs,
+            steps_since_keyframe=jnp.where(keyframe, 0, steps_since_keyframe),
+        )
+        return delta, state, reward, done, info
+
+
 @struct.dataclass
 class LogEnvState:
     env_state: EnvState
@@ -205,15 +717,23 @@ class MultiRewardLogEnvState:
     returned_episode_lengths: int
 
 class MultiRewardLogWrapper(GymnaxWrapper):
-    """Log the episode returns and lengths."""
+    """Log the episode returns and lengths, for the env reward and every custom reward function.
+
+    The per-reward returns are reported as a single array under `returned_episode_returns`.
+    """
+
+    @property
+    def num_rewards(self) -> int:
+        # environments without custom reward functions report a single zero reward in `all_rewards`
+        reward_funcs = getattr(self._env, "reward_funcs", None)
+        return 1 if reward_funcs is None else len(reward_funcs)
 
     @functools.partial(jax.jit, static_argnums=(0,))
     def reset(
         self, key: chex.PRNGKey, 
     ) -> Tuple[chex.Array, MultiRewardLogEnvState]:
         obs, env_state = self._env.reset(key)
-        dummy_info = self._env.step(key, env_state, 0)[4]
-        episode_returns_init = jnp.zeros_like(dummy_info["all_rewards"])
+        episode_returns_init = jnp.zeros(self.num_rewards)
         state = MultiRewardLogEnvState(env_state, 0, episode_returns_init, 0, 0, episode_returns_init, 0)
         return obs, state
 
@@ -253,8 +773,193 @@ class MultiRewardLogWrapper(GymnaxWrapper):
             + new_episode_length * done,
         )
         info["returned_episode_env_returns"] = state.returned_episode_returns_env
-        for i, r in enumerate(new_episode_return):
-            info[f"returned_episode_returns_{i}"] = state.returned_episode_returns[i]
+        info["returned_episode_returns"] = state.returned_episode_returns
         info["returned_episode_lengths"] = state.returned_episode_lengths
         info["returned_episode"] = done
-        return obs, state, reward, done, info
\ No newline at end of file
+        return obs, state, reward, done, info
+
+
+@struct.dataclass
+class EpisodeStatistics:
+    """Running statistics over all episodes completed since the last flush."""
+    episode_count: chex.Array
+    return_mean: chex.Array
+    return_m2: chex.Array
+    length_mean: chex.Array
+    length_m2: chex.Array
+    return_histogram: chex.Array
+    length_histogram: chex.Array
+
+
+@struct.dataclass
+class EpisodeStatsEnvState:
+    env_state: EnvState
+    episode_returns: float
+    episode_lengths: int
+    stats: EpisodeStatistics
+
+
+class EpisodeStatsWrapper(GymnaxWrapper):
+    """Aggregate the returns and lengths of completed episodes on device.
+
+    Instead of reporting the returns of every env in every step, the wrapper keeps
+    fixed-size histograms and running moments (Welford) in its state. They only have
+    to be transferred to the host when calling `flush`, e.g. every `flush_interval` steps
+    via `maybe_flush`. Returns and lengths outside of the histogram ranges are counted
+    in the first/last bin.
+    """
+
+    def __init__(
+        self,
+        env,
+        return_range: Tuple[float, float],
+        max_episode_length: int = 10_000,
+        num_bins: int = 64,
+        flush_interval: int = 1_000,
+    ):
+        super().__init__(env)
+        self.return_range = (float(return_range[0]), float(return_range[1]))
+        self.max_episode_length = max_episode_length
+        self.num_bins = num_bins
+        self.flush_interval = flush_interval
+
+    def _empty_stats(self) -> EpisodeStatistics:
+        return EpisodeStatistics(
+            episode_count=jnp.array(0, dtype=jnp.int32),
+            return_mean=jnp.array(0.0),
+            return_m2=jnp.array(0.0),
+            length_mean=jnp.array(0.0),
+            length_m2=jnp.array(0.0),
+            return_histogram=jnp.zeros(self.num_bins, dtype=jnp.int32),
+            length_histogram=jnp.zeros(self.num_bins, dtype=jnp.int32),
+        )
+
+    def _bin_index(self, value: chex.Array, low: float, high: float) -> chex.Array:
+        idx = jnp.floor((value - low) / (high - low) * self.num_bins).astype(jnp.int32)
+        return jnp.clip(idx, 0, self.num_bins - 1)
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def reset(
+        self, key: chex.PRNGKey
+    ) -> Tuple[chex.Array, EpisodeStatsEnvState]:
+        obs, env_state = self._env.reset(key)
+        state = EpisodeStatsEnvState(env_state, 0.0, 0, self._empty_stats())
+        return obs, state
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def step(
+        self,
+        key: chex.PRNGKey,
+        state: EpisodeStatsEnvState,
+        action: Union[int, float],
+    ) -> Tuple[chex.Array, EpisodeStatsEnvState, jnp.ndarray, bool, Dict[Any, Any]]:
+        """Step the env and add the episode to the statistics if it is done.
+
+        Args:
+          key: PRNG key.
+          state: The current state of the env.
+          action: The action to take.
+
+        Returns:
+          A tuple of (observation, state, reward, done, info).
+        """
+        obs, env_state, reward, done, info = self._env.step(
+            key, state.env_state, action
+        )
+        new_episode_return = state.episode_returns + reward
+        new_episode_length = state.episode_lengths + 1
+
+        stats = state.stats
+        count = stats.episode_count + done
+        # Welford update, masked by done
+        return_delta = new_episode_return - stats.return_mean
+        return_mean = stats.return_mean + done * return_delta / jnp.maximum(count, 1)
+        return_m2 = stats.return_m2 + done * return_delta * (new_episode_return - return_mean)
+        length_delta = new_episode_length - stats.length_mean
+        length_mean = stats.length_mean + done * length_delta / jnp.maximum(count, 1)
+        length_m2 = stats.length_m2 + done * length_delta * (new_episode_length - length_mean)
+
+        return_bin = self._bin_index(new_episode_return, *self.return_range)
+        length_bin = self._bin_index(new_episode_length, 0, self.max_episode_length)
+        stats = EpisodeStatistics(
+            episode_count=count,
+            return_mean=return_mean,
+            return_m2=return_m2,
+            length_mean=length_mean,
+            length_m2=length_m2,
+            return_histogram=stats.return_histogram.at[return_bin].add(done),
+            length_histogram=stats.length_histogram.at[length_bin].add(done),
+        )
+
+        state = EpisodeStatsEnvState(
+            env_state=env_state,
+            episode_returns=new_episode_return * (1 - done),
+            episode_lengths=new_episode_length * (1 - done),
+            stats=stats,
+        )
+        return obs, state, reward, done, info
+
+    @functools.partial(jax.jit, static_argnums=(0,))
+    def _merge_stats(self, stats: EpisodeStatistics) -> EpisodeStatistics:
+        """Merges the statistics of all (vmapped) envs into one using Chan's parallel update."""
+        # flatten all batch dimensions, histograms keep their bin dimension
+        stats = jax.tree.map(
+            lambda x: x.reshape(-1, self.num_bins) if x.shape[-1:] == (self.num_bins,) else x.reshape(-1),
+            stats,
+        )
+        count = stats.episode_count.sum()
+        weights = stats.episode_count / jnp.maximum(count, 1)
+        return_mean = jnp.sum(weights * stats.return_mean)
+        length_mean = jnp.sum(weights * stats.length_mean)
+        return EpisodeStatistics(
+            episode_count=count,
+            return_mean=return_mean,
+            return_m2=jnp.sum(stats.return_m2 + stats.episode_count * (stats.return_mean - return_mean) ** 2),
+            length_mean=length_mean,
+            length_m2=jnp.sum(stats.length_m2 + stats.episode_count * (stats.length_mean - length_mean) ** 2),
+            return_histogram=stats.return_histogram.sum(axis=0),
+            length_histogram=stats.length_histogram.sum(axis=0),
+        )
+
+    def flush(self, state: EpisodeStatsEnvState) -> Tuple[Dict[str, Any], EpisodeStatsEnvState]:
+        """Transfers the aggregated statistics to the host and clears them in the state.
+
+        Args:
+          state: The (possibly batched) wrapper state.
+
+        Returns:
+          A tuple of (summary, state). The summary contains the number of episodes, mean and std
+          of returns and lengths, the 5/50/95 return percentiles (upper edge of the histogram bin) and
+          the histograms together with their bin edges.
+        """
+        stats = jax.device_get(self._merge_stats(state.stats))
+        count = int(stats.episode_count)
+        return_edges = np.linspace(*self.return_range, self.num_bins + 1)
+        length_edges = np.linspace(0, self.max_episode_length, self.num_bins + 1)
+        cdf = np.cumsum(stats.return_histogram) / max(count, 1)
+        percentiles = {
+            f"return_p{q}": float(return_edges[1:][np.searchsorted(cdf, q / 100)]) if count > 0 else np.nan
+            for q in (5, 50, 95)
+        }
+        summary = {
+            "episodes": count,
+            "return_mean": float(stats.return_mean) if count > 0 else np.nan,
+            "return_std": float(np.sqrt(stats.return_m2 / count)) if count > 0 else np.nan,
+            "length_mean": float(stats.length_mean) if count > 0 else np.nan,
+            "length_std": float(np.sqrt(stats.length_m2 / count)) if count > 0 else np.nan,
+            **percentiles,
+            "return_histogram": stats.return_histogram,
+            "return_bin_edges": return_edges,
+            "length_histogram": stats.length_histogram,
+            "length_bin_edges": length_edges,
+        }
+        empty_stats = jax.tree.map(jnp.zeros_like, state.stats)
+        return summary, state.replace(stats=empty_stats)
+
+    def maybe_flush(
+        self, state: EpisodeStatsEnvState, step: int
+    ) -> Tuple[Union[Dict[str, Any], None], EpisodeStatsEnvState]:
+        """Calls `flush` every `flush_interval` steps, otherwise returns (None, state) without any transfer."""
+        if step % self.flush_interval != 0:
+            return None, state
+        return self.flush(state)
\ No newline at end of file